@@ -11,7 +11,7 @@ import os
 import sys
 import argparse
 from colorama import Fore, Style, init
-from lib.utils import sort_files_by_directory_depth
+from lib.utils import sort_files_by_directory_depth, format_file_size
 
 # Initialize colorama with forced colors for container support
 init(autoreset=True, strip=False)
@@ -47,14 +47,6 @@ def check_files_exist(file_list):
     
     return existing, missing
 
-def format_file_size(size_bytes):
-    """Formats file size"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024:
-            return f"{size_bytes:.1f} {unit}"
-        size_bytes /= 1024
-    return f"{size_bytes:.1f} TB"
-
 def calculate_total_size(file_list):
     """Calculates total file size"""
     total_size = 0
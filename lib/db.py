@@ -1,14 +1,176 @@
+import contextlib
 import sqlite3
 
-def query_all_database(db_path, fields, include_corrupted=False):
+# Connection settings for read-heavy queries and batched analyzer writes
+CONNECTION_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-131072',  # 128 MB
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=1073741824',  # 1 GB
+]
+
+def connect(db_path, **kwargs):
+    """
+    Opens database connection with CONNECTION_PRAGMAS
+    
+    PRAGMAs that can't be applied (e.g. WAL on read-only database) are skipped.
+    """
+    conn = sqlite3.connect(db_path, **kwargs)
+    cursor = conn.cursor()
+    for pragma in CONNECTION_PRAGMAS:
+        try:
+            cursor.execute(pragma)
+        except sqlite3.OperationalError:
+            pass
+    return conn
+
+# os.path.dirname(file_path) in SQL: cut after last '/', then drop trailing slashes (except root)
+DIR_PATH_SQL = (
+    "coalesce(nullif(rtrim(rtrim(file_path, replace(file_path, '/', '')), '/'), ''), "
+    "rtrim(file_path, replace(file_path, '/', '')))"
+)
+
+# os.path.splitext(file_name)[0] in SQL: cut before last '.', unless it is a leading dot
+BASE_NO_EXT_SQL = (
+    "CASE WHEN ltrim(rtrim(file_name, replace(file_name, '.', '')), '.') = '' THEN file_name "
+    "ELSE substr(file_name, 1, length(rtrim(file_name, replace(file_name, '.', ''))) - 1) END"
+)
+
+# os.path.basename(file_path) in SQL: everything after the last '/'
+BASE_NAME_SQL = "substr(file_path, length(rtrim(file_path, replace(file_path, '/', ''))) + 1)"
+
+def directory_order_sql(alias=None):
+    """
+    Returns ORDER BY terms sorting like lib.utils.sort_files_by_directory_depth:
+    deeper directories first, then by directory, then by file name
+    """
+    dir_path, base_name = DIR_PATH_SQL, BASE_NAME_SQL
+    if alias:
+        dir_path = dir_path.replace('file_path', f'{alias}.file_path')
+        base_name = base_name.replace('file_path', f'{alias}.file_path')
+    depth = f"length({dir_path}) - length(replace({dir_path}, '/', ''))"
+    return f"{depth} DESC, {dir_path}, {base_name}"
+
+@contextlib.contextmanager
+def read_transaction(conn):
+    """
+    Runs queries of the block in one read transaction
+    
+    All of them see the same snapshot (e.g. a summary query and the rows it
+    counts, while media_analyzer writes), and the lock is taken once instead
+    of per statement. Nothing is written, so the block ends with a plain commit.
+    """
+    conn.execute("BEGIN")
+    try:
+        yield
+    finally:
+        conn.commit()
+
+# Virtual generated columns for lookups by directory and base name
+PATH_COLUMNS = {
+    'dir_path': DIR_PATH_SQL,
+    'base_no_ext': BASE_NO_EXT_SQL,
+}
+
+def ensure_path_columns(conn):
+    """
+    Adds dir_path and base_no_ext generated columns (and their index) to media_files
+    
+    Columns are VIRTUAL, so existing databases get them without rewriting rows.
+    
+    Returns:
+        bool: True if columns are available, False if they can't be added (read-only database)
+    """
+    cursor = conn.cursor()
+    existing = {row[1] for row in cursor.execute("PRAGMA table_xinfo(media_files)")}
+    try:
+        for column, expression in PATH_COLUMNS.items():
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE media_files ADD COLUMN {column} TEXT GENERATED ALWAYS AS ({expression}) VIRTUAL")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_dir_base ON media_files(dir_path, base_no_ext)")
+        conn.commit()
+    except sqlite3.OperationalError:
+        conn.rollback()
+        return False
+    return True
+
+# Duplicate groups by hash (exact duplicates): hash, number of files and largest file size
+DUPLICATE_GROUPS_SQL = '''
+    SELECT file_hash, COUNT(*) as cnt, MAX(file_size) as group_size
+    FROM media_files 
+    WHERE file_hash IS NOT NULL AND file_hash != '' AND is_corrupted = 0
+    GROUP BY file_hash
+    HAVING COUNT(*) >= 2
+'''
+
+def has_statistics(conn, table):
+    """Checks if sqlite_stat1 has rows for table, i.e. it was analyzed at least once"""
+    try:
+        return conn.execute("SELECT 1 FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table,)).fetchone() is not None
+    except sqlite3.OperationalError:
+        return False  # No sqlite_stat1, database was never analyzed
+
+def media_files_state(conn):
+    """
+    Returns a value that changes whenever rows of media_files are added, replaced or deleted
+    
+    Based on row count and AUTOINCREMENT sequence (INSERT OR REPLACE always takes a new id).
+    """
+    cursor = conn.cursor()
+    count = cursor.execute("SELECT COUNT(*) FROM media_files").fetchone()[0]
+    row = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'media_files'").fetchone()
+    return f"{count}:{row[0] if row else 0}"
+
+def ensure_duplicate_hashes(conn, refresh=False):
+    """
+    Creates or refreshes duplicate_hashes table with DUPLICATE_GROUPS_SQL results
+    
+    The table is rebuilt when media_files changed since it was built
+    (see media_files_state) or when refresh is requested.
+    
+    Returns:
+        bool: True if the table is up to date, False if it can't be built (read-only database)
+    """
+    cursor = conn.cursor()
+    state = media_files_state(conn)
+    try:
+        built_state = cursor.execute("SELECT source_state FROM duplicate_hashes_state").fetchone()
+    except sqlite3.OperationalError:
+        built_state = None  # Table doesn't exist yet
+    if not refresh and built_state is not None and built_state[0] == state:
+        return True
+    
+    try:
+        # Recreated rather than emptied, in one transaction with its state: dropping is
+        # cheaper than deleting every row and the order index is built once after the
+        # insert. WITHOUT ROWID keeps rows in the file_hash b-tree, no separate key index
+        cursor.execute("BEGIN")
+        cursor.execute("DROP TABLE IF EXISTS duplicate_hashes")
+        cursor.execute("""
+            CREATE TABLE duplicate_hashes (
+                file_hash TEXT PRIMARY KEY,
+                cnt INTEGER NOT NULL,
+                group_size INTEGER
+            ) WITHOUT ROWID
+        """)
+        cursor.execute(f"INSERT INTO duplicate_hashes (file_hash, cnt, group_size) {DUPLICATE_GROUPS_SQL}")
+        cursor.execute("CREATE INDEX idx_duplicate_hashes_order ON duplicate_hashes(cnt DESC, file_hash DESC)")
+        cursor.execute("CREATE TABLE IF NOT EXISTS duplicate_hashes_state (source_state TEXT NOT NULL)")
+        cursor.execute("DELETE FROM duplicate_hashes_state")
+        cursor.execute("INSERT INTO duplicate_hashes_state (source_state) VALUES (?)", (state,))
+        conn.commit()
+    except sqlite3.OperationalError:
+        conn.rollback()
+        return False
+    return True
+
+def query_all_database(conn, fields, include_corrupted=False):
     """Execute a query on the SQLite database and return the results."""
-    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     query = f"SELECT {', '.join(fields)} FROM media_files"
     if not include_corrupted:
         query += " WHERE is_corrupted = 0"
     query += " ORDER BY file_path"
     cursor.execute(query)
-    results = cursor.fetchall()
-    conn.close()
-    return results
\ No newline at end of file
+    return cursor.fetchall()
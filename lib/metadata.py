@@ -11,6 +11,41 @@ import json
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import av
+except ImportError:  # PyAV is optional, ffprobe is used instead
+    av = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, standard json is used instead
+    orjson = None
+
+# Parses JSON output of exiftool, both accept bytes.
+# orjson.JSONDecodeError is a subclass of json.JSONDecodeError.
+json_loads = orjson.loads if orjson is not None else json.loads
+
+
+# Fields requested from ffprobe (see get_video_metadata_ffprobe)
+FFPROBE_ENTRIES = (
+    'stream=codec_type,codec_name,codec_long_name,width,height,r_frame_rate'
+    ':format=duration,bit_rate,format_name,format_long_name'
+    ':format_tags=creation_time'
+)
+
+# Limits on how much of the file is read to find stream info (bytes / microseconds).
+# Set explicitly so long TS/MPEG streams are never probed further than needed.
+PROBE_SIZE = 5000000
+ANALYZE_DURATION = 5000000
+
+# Seconds a video metadata read may take (ffprobe run, PyAV open and reads)
+VIDEO_METADATA_TIMEOUT = 30
+
+# Backends available for reading video metadata
+VIDEO_BACKENDS = ('pyav', 'ffprobe')
+PYAV_AVAILABLE = av is not None
+DEFAULT_VIDEO_BACKEND = 'pyav' if PYAV_AVAILABLE else 'ffprobe'
+
 
 class VideoMetadataError(Exception):
     """Base exception for video metadata operations"""
@@ -23,7 +58,7 @@ class VideoCorruptedError(VideoMetadataError):
 
 
 class VideoTimeoutError(VideoMetadataError):
-    """Exception raised when ffprobe operation times out"""
+    """Exception raised when ffprobe or PyAV operation times out"""
     pass
 
 
@@ -69,7 +104,8 @@ def set_image_exif_datetime(file_path: str, creation_time: datetime, dry_run: bo
             file_path
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        # Output is not used, so it is captured as bytes without decoding
+        result = subprocess.run(cmd, capture_output=True, timeout=30)
         return result.returncode == 0
         
     except Exception:
@@ -151,13 +187,13 @@ def get_image_metadata(file_path: str) -> dict:
             file_path
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
+        result = subprocess.run(cmd, capture_output=True, timeout=15)
         if result.returncode != 0:
             return {}
             
         # Parse JSON output
         try:
-            data = json.loads(result.stdout)
+            data = json_loads(result.stdout)
             if isinstance(data, list) and len(data) > 0:
                 metadata = data[0]
                 
@@ -184,97 +220,171 @@ def get_image_metadata(file_path: str) -> dict:
         return {}
 
 
-def get_video_metadata(file_path: str) -> dict:
+def parse_creation_time(date_str):
+    """
+    Parse creation_time tag value written by cameras and muxers
+    
+    Args:
+        date_str: Tag value, e.g. '2021-05-06T07:08:09.000000Z'
+        
+    Returns:
+        str: Creation date in ISO format or None if the value can't be parsed
+    """
+    try:
+        if date_str and date_str != '0000-00-00T00:00:00.000000Z':
+            # Remove microseconds and timezone for parsing
+            clean_date = date_str.replace('Z', '').split('.')[0]
+            if 'T' in clean_date:
+                return datetime.fromisoformat(clean_date).isoformat()
+    except (ValueError, TypeError):
+        pass
+    return None
+
+
+def get_video_metadata(file_path: str, backend: str = None) -> dict:
     """
-    Get video metadata using ffprobe via Docker
+    Get video metadata using PyAV (in-process) or ffprobe
     
     Args:
         file_path: Path to the video file
+        backend: 'pyav' or 'ffprobe' (default: pyav if installed, ffprobe otherwise)
         
     Returns:
         dict: Dictionary with video metadata including creation_date, dimensions, codec info, etc.
     
     Raises:
-        VideoCorruptedError: If the video file is corrupted or ffprobe fails
-        VideoTimeoutError: If ffprobe operation times out
+        VideoCorruptedError: If the video file is corrupted or can't be opened
+        VideoTimeoutError: If ffprobe or PyAV operation times out
         VideoNoStreamError: If no video stream is found in the file
         VideoMetadataError: For other video metadata related errors
     """
+    backend = backend or DEFAULT_VIDEO_BACKEND
+    if backend == 'pyav':
+        if not PYAV_AVAILABLE:
+            raise VideoMetadataError("PyAV is not installed (pip install av)")
+        return get_video_metadata_pyav(file_path)
+    if backend == 'ffprobe':
+        return get_video_metadata_ffprobe(file_path)
+    raise VideoMetadataError(f"Unknown video backend: {backend}")
+
+
+def get_video_metadata_pyav(file_path: str) -> dict:
+    """
+    Get video metadata using PyAV
+    
+    Reads container headers in-process, so no ffprobe process is started per file.
+    See get_video_metadata for the returned fields and raised exceptions.
+    """
+    try:
+        container = av.open(
+            file_path,
+            metadata_errors='ignore',
+            options={'probesize': str(PROBE_SIZE), 'analyzeduration': str(ANALYZE_DURATION)},
+            timeout=VIDEO_METADATA_TIMEOUT
+        )
+    except av.ExitError:
+        # Interrupted by the timeout, a file hanging on demux doesn't block the worker
+        raise VideoTimeoutError(f"PyAV timeout ({VIDEO_METADATA_TIMEOUT}s)")
+    except av.FFmpegError as e:
+        raise VideoCorruptedError(f"PyAV error: {str(e)}")
+    
+    try:
+        if not container.streams.video:
+            raise VideoNoStreamError("No video stream found in file")
+        
+        stream = container.streams.video[0]
+        codec_context = stream.codec_context
+        # base_rate is the same value ffprobe reports as r_frame_rate
+        frame_rate = stream.base_rate or stream.average_rate
+        
+        return {
+            'duration': container.duration / av.time_base if container.duration else 0.0,
+            'width': codec_context.width or 0,
+            'height': codec_context.height or 0,
+            'codec_name': codec_context.codec.canonical_name if codec_context.codec else '',
+            'codec_long_name': codec_context.codec.long_name if codec_context.codec else '',
+            'bit_rate': container.bit_rate or 0,
+            'format_name': container.format.name or '',
+            'format_long_name': container.format.long_name or '',
+            'frame_rate': float(frame_rate) if frame_rate else 0.0,
+            'creation_date': parse_creation_time(container.metadata.get('creation_time'))
+        }
+    except av.FFmpegError as e:
+        raise VideoCorruptedError(f"PyAV error: {str(e)}")
+    finally:
+        container.close()
+
+
+def get_video_metadata_ffprobe(file_path: str) -> dict:
+    """
+    Get video metadata using ffprobe
+    
+    See get_video_metadata for the returned fields and raised exceptions.
+    """
     # Get absolute file path
     file_path = os.path.abspath(file_path)
     
-    # Use ffprobe directly to get video information
+    # Use ffprobe directly to get video information.
+    # Only consumed fields are requested, printed as flat key=value lines.
     cmd = [
-        'ffprobe', '-v', 'quiet', '-print_format', 'json',
-        '-show_format', '-show_streams', '-select_streams', 'v:0',
+        'ffprobe', '-v', 'quiet',
+        '-probesize', str(PROBE_SIZE), '-analyzeduration', str(ANALYZE_DURATION),
+        '-select_streams', 'v:0',
+        '-show_entries', FFPROBE_ENTRIES,
+        '-of', 'default=noprint_wrappers=1:nokey=0',
         file_path
     ]
     
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        result = subprocess.run(cmd, capture_output=True, timeout=VIDEO_METADATA_TIMEOUT)
         
         if result.returncode != 0:
-            error_msg = result.stderr.strip() if result.stderr else "ffprobe returned non-zero exit code"
+            error_msg = result.stderr.decode('utf-8', 'replace').strip() if result.stderr else "ffprobe returned non-zero exit code"
             raise VideoCorruptedError(f"ffprobe error: {error_msg}")
-            
-        data = json.loads(result.stdout)
         
     except subprocess.TimeoutExpired:
-        raise VideoTimeoutError("ffprobe timeout (30s)")
-    except json.JSONDecodeError as e:
-        raise VideoCorruptedError(f"JSON decode error: {str(e)}")
+        raise VideoTimeoutError(f"ffprobe timeout ({VIDEO_METADATA_TIMEOUT}s)")
     except subprocess.SubprocessError as e:
         raise VideoMetadataError(f"Subprocess error: {str(e)}")
     
-    # Extract format information
-    format_info = data.get('format', {})
-    
-    # Find first video stream
-    video_stream = None
-    for stream in data.get('streams', []):
-        if stream.get('codec_type') == 'video':
-            video_stream = stream
-            break
+    # Parse key=value lines, ffprobe prints N/A for unknown values
+    data = {}
+    for line in result.stdout.decode('utf-8', 'replace').splitlines():
+        key, sep, value = line.partition('=')
+        if sep and value != 'N/A':
+            data[key] = value
     
-    if not video_stream:
+    # Stream fields are missing if there is no video stream
+    if data.get('codec_type') != 'video':
         raise VideoNoStreamError("No video stream found in file")
     
     # Extract metadata
-    metadata = {
-        'duration': float(format_info.get('duration', 0)),
-        'width': int(video_stream.get('width', 0)),
-        'height': int(video_stream.get('height', 0)),
-        'codec_name': video_stream.get('codec_name', ''),
-        'codec_long_name': video_stream.get('codec_long_name', ''),
-        'bit_rate': int(format_info.get('bit_rate', 0)),
-        'format_name': format_info.get('format_name', ''),
-        'format_long_name': format_info.get('format_long_name', ''),
-        'frame_rate': 0.0,
-        'creation_date': None
-    }
+    try:
+        metadata = {
+            'duration': float(data.get('duration', 0)),
+            'width': int(data.get('width', 0)),
+            'height': int(data.get('height', 0)),
+            'codec_name': data.get('codec_name', ''),
+            'codec_long_name': data.get('codec_long_name', ''),
+            'bit_rate': int(data.get('bit_rate', 0)),
+            'format_name': data.get('format_name', ''),
+            'format_long_name': data.get('format_long_name', ''),
+            'frame_rate': 0.0,
+            'creation_date': None
+        }
+    except ValueError as e:
+        raise VideoCorruptedError(f"ffprobe output parse error: {str(e)}")
     
     # Extract creation date from format tags if available
-    tags = format_info.get('tags', {})
-    for tag_key in ['creation_time']:
-        if tag_key in tags:
-            try:
-                # Parse ISO format datetime
-                date_str = tags[tag_key]
-                if date_str and date_str != '0000-00-00T00:00:00.000000Z':
-                    # Remove microseconds and timezone for parsing
-                    clean_date = date_str.replace('Z', '').split('.')[0]
-                    if 'T' in clean_date:
-                        creation_date = datetime.fromisoformat(clean_date)
-                        metadata['creation_date'] = creation_date.isoformat()
-                        break
-            except (ValueError, TypeError):
-                continue
+    metadata['creation_date'] = parse_creation_time(data.get('TAG:creation_time'))
     
-    # Calculate frame rate
-    r_frame_rate = video_stream.get('r_frame_rate', '0/1')
-    if '/' in r_frame_rate:
-        num, den = r_frame_rate.split('/')
-        if int(den) != 0:
-            metadata['frame_rate'] = float(num) / float(den)
+    # Calculate frame rate from 'num/den' rational, both parts are integers
+    num, _, den = data.get('r_frame_rate', '0/1').partition('/')
+    try:
+        den_i = int(den) if den else 0
+        if den_i:
+            metadata['frame_rate'] = int(num) / den_i
+    except ValueError:
+        pass
     
     return metadata
\ No newline at end of file
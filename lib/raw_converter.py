@@ -35,10 +35,10 @@ def convert_raw_image_rawtherapee(input_path, temp_output_path, quality=95, logg
         ]
         
         # Run RawTherapee CLI (suppress output for parallel processing)
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        result = subprocess.run(cmd, capture_output=True, timeout=300)
         
         if result.returncode != 0:
-            raise Exception(f"RawTherapee CLI failed: {result.stderr}")
+            raise Exception(f"RawTherapee CLI failed: {result.stderr.decode('utf-8', 'replace')}")
         
         # Check if output file was created
         if not os.path.exists(temp_output_path):
@@ -47,7 +47,7 @@ def convert_raw_image_rawtherapee(input_path, temp_output_path, quality=95, logg
         # Inherit modification time from original RAW file using touch -r
         # This preserves the original file timestamps for proper chronological sorting
         touch_cmd = ['touch', '-r', input_abs, temp_abs]
-        touch_result = subprocess.run(touch_cmd, capture_output=True, text=True, timeout=10)
+        touch_result = subprocess.run(touch_cmd, capture_output=True, timeout=10)
         
         # Load the converted image to get dimensions (RawTherapee handles all metadata automatically)
         with Image.open(temp_output_path) as img:
@@ -11,6 +11,7 @@ import unicodedata
 from pathlib import Path
 from colorama import Fore, Style
 import re
+from .db import connect
 
 # Media file extensions
 # Supported video formats
@@ -73,7 +74,9 @@ def read_file_list(file_path):
         with open(file_path, 'r', encoding='utf-8') as f:
             for line in f:
                 line = line.strip()
-                line = unicodedata.normalize("NFC", line)
+                # NFC normalization doesn't change ASCII lines
+                if not line.isascii():
+                    line = unicodedata.normalize("NFC", line)
                 # Skip comments and empty lines
                 if line and not line.startswith('#'):
                     files.append(line)
@@ -85,15 +88,17 @@ def read_file_list(file_path):
         print(f"{Fore.RED}❌ Error reading file: {e}{Style.RESET_ALL}")
         return []
 
+FILE_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
 def format_file_size(size_bytes):
     """Formats file size in human readable format"""
     if size_bytes is None:
         return "N/A"
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024:
-            return f"{size_bytes:.1f} {unit}"
-        size_bytes /= 1024
-    return f"{size_bytes:.1f} TB"
+    if size_bytes < 1024:
+        return f"{size_bytes:.1f} B"
+    # Unit index from integer log2 instead of dividing in a loop
+    unit = min((int(size_bytes).bit_length() - 1) // 10, 4)
+    return f"{size_bytes / (1 << (10 * unit)):.1f} {FILE_SIZE_UNITS[unit]}"
 
 def format_duration(seconds):
     """Formats duration in MM:SS format"""
@@ -304,7 +309,7 @@ def load_database_file_paths(db_path):
         raise ValueError(f"Database file does not exist: {db_path}")
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect(db_path)
         cursor = conn.cursor()
         
         cursor.execute('SELECT file_path FROM media_files')
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Video conversion functions using FFmpeg via Docker
+Video conversion functions using FFmpeg
 
 Functions for building FFmpeg commands and handling video conversion operations.
 """
@@ -11,6 +11,10 @@ import shutil
 import tempfile
 import time
 import logging
+import threading
+import hashlib
+import fcntl
+from collections import defaultdict
 from pathlib import Path
 
 # codec_name field
@@ -20,28 +24,204 @@ OUTDATED_CODECS = ['mpeg2video', 'mjpeg', 'mpeg4', 'mpeg1video']
 OUTDATED_FORMATS = ['mpeg', 'mpegts']
 
 
-def build_ffmpeg_command(input_path, output_path):
-    """Builds FFmpeg command for encoding directly (no Docker)"""
-    # Get absolute paths
-    input_abs = os.path.abspath(input_path)
-    output_abs = os.path.abspath(output_path)
+class EncodingStoppedError(Exception):
+    """Exception raised when encoding is stopped by stop_encoding()"""
+    pass
 
-    # Build direct ffmpeg command
-    cmd = [
-        'ffmpeg',
-        '-hide_banner',
-        '-i', input_abs,
-        '-vf', 'scale=\'min(1280,iw)\':-2,format=yuv420p',
+
+# ffmpeg processes started by this process, killed by stop_encoding()
+_running_processes = set()
+_processes_lock = threading.RLock()
+_stopping = threading.Event()
+
+
+def run_ffmpeg(cmd, timeout, text=False):
+    """
+    Runs ffmpeg like subprocess.run(capture_output=True), tracking the process
+    
+    Raises:
+        EncodingStoppedError: If stop_encoding() was called before or during the run
+        subprocess.TimeoutExpired: If ffmpeg runs longer than timeout (process is killed)
+    """
+    if _stopping.is_set():
+        raise EncodingStoppedError("Encoding stopped")
+    
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=text)
+    with _processes_lock:
+        _running_processes.add(process)
+    try:
+        # Stop could come between the check above and registration
+        if _stopping.is_set():
+            process.kill()
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+    finally:
+        with _processes_lock:
+            _running_processes.discard(process)
+    
+    if _stopping.is_set():
+        raise EncodingStoppedError("Encoding stopped")
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def stop_encoding():
+    """
+    Kills running ffmpeg processes and makes further run_ffmpeg calls fail
+    
+    Safe to call from a signal handler.
+    """
+    _stopping.set()
+    with _processes_lock:
+        for process in _running_processes:
+            try:
+                process.kill()
+            except OSError:
+                pass  # Already finished
+
+
+def check_ffmpeg():
+    """
+    Checks that ffmpeg is available
+    
+    Only looks the binary up in PATH, no process is started.
+    
+    Returns:
+        bool: True if ffmpeg is found, False otherwise
+    """
+    return shutil.which('ffmpeg') is not None
+
+
+# Scale down to 720p width limit, never upscale
+SCALE_FILTER = 'scale=\'min(1280,iw)\':-2'
+
+# Video encoding settings per encoder (software x264 or hardware H.264)
+ENCODERS = {
+    'x264': [
+        '-vf', f'{SCALE_FILTER},format=yuv420p',
         '-c:v', 'libx264',
         '-preset', 'fast',
         '-crf', '22',
         '-profile:v', 'high',
-        '-c:a', 'aac',
-        '-b:a', '160k',
-        '-ac', '2',
-        '-ar', '48000',
-        '-movflags', '+faststart',
-        '-map_metadata', '0',
+    ],
+    'nvenc': [
+        '-vf', f'{SCALE_FILTER},format=yuv420p',
+        '-c:v', 'h264_nvenc',
+        '-preset', 'p5',
+        '-rc', 'vbr',
+        '-cq', '23',
+        '-profile:v', 'high',
+    ],
+    'qsv': [
+        '-vf', f'{SCALE_FILTER},format=nv12',
+        '-c:v', 'h264_qsv',
+        '-preset', 'medium',
+        '-global_quality', '23',
+        '-profile:v', 'high',
+    ],
+    'vaapi': [
+        '-vf', f'{SCALE_FILTER},format=nv12,hwupload',
+        '-c:v', 'h264_vaapi',
+        '-qp', '23',
+        '-profile:v', 'high',
+    ],
+}
+
+# Options placed before inputs (hardware device setup)
+ENCODER_GLOBAL_OPTIONS = {
+    'vaapi': ['-vaapi_device', '/dev/dri/renderD128'],
+}
+
+# Hardware encoders tried by detect_encoder, in order of preference
+HARDWARE_ENCODERS = ['nvenc', 'qsv', 'vaapi']
+
+# Audio and container settings applied to every output
+OUTPUT_OPTIONS = [
+    '-c:a', 'aac',
+    '-b:a', '160k',
+    '-ac', '2',
+    '-ar', '48000',
+    '-movflags', '+faststart',
+]
+
+
+# Machine-readable progress to stdout instead of stats lines to stderr,
+# so stderr only carries messages (used as error text on failure)
+PROGRESS_OPTIONS = ['-nostats', '-progress', 'pipe:1']
+
+
+def get_encode_options(encoder='x264'):
+    """Returns FFmpeg output options for given encoder"""
+    return ENCODERS[encoder] + OUTPUT_OPTIONS
+
+
+def check_encoder(encoder):
+    """
+    Checks that encoder works on this machine
+    
+    Encodes one frame of a generated test picture, so missing GPU, driver or
+    ffmpeg build support all make the check fail.
+    
+    Returns:
+        bool: True if test encode succeeded, False otherwise
+    """
+    cmd = ['ffmpeg', '-hide_banner', '-v', 'error'] + ENCODER_GLOBAL_OPTIONS.get(encoder, [])
+    cmd += ['-f', 'lavfi', '-i', 'nullsrc=s=640x360:d=1', '-frames:v', '1']
+    cmd += ENCODERS[encoder] + ['-f', 'null', '-']
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=30)
+        return result.returncode == 0
+    except (subprocess.TimeoutExpired, OSError):
+        return False
+
+
+def detect_encoder():
+    """
+    Detects best available encoder
+    
+    Returns:
+        str: First working hardware encoder (see HARDWARE_ENCODERS) or 'x264'
+    """
+    for encoder in HARDWARE_ENCODERS:
+        if check_encoder(encoder):
+            return encoder
+    return 'x264'
+
+
+def parse_ffmpeg_progress(output):
+    """
+    Parses ffmpeg -progress output (key=value lines)
+    
+    Returns:
+        dict: Values of the last progress block (str), empty if there is none
+    """
+    progress = {}
+    for line in output.splitlines():
+        key, _, value = line.partition('=')
+        progress[key] = value
+    return progress
+
+
+def build_ffmpeg_command(input_path, output_path, threads=None, encoder='x264'):
+    """
+    Builds FFmpeg command for encoding directly (no Docker)
+    
+    threads limits encoder threads, used when several ffmpeg processes run in parallel.
+    encoder is a key of ENCODERS.
+    """
+    # Get absolute paths
+    input_abs = os.path.abspath(input_path)
+    output_abs = os.path.abspath(output_path)
+
+    # Build direct ffmpeg command
+    cmd = ['ffmpeg', '-hide_banner'] + PROGRESS_OPTIONS + ENCODER_GLOBAL_OPTIONS.get(encoder, [])
+    cmd += ['-i', input_abs] + get_encode_options(encoder) + ['-map_metadata', '0']
+    if threads:
+        cmd += ['-threads', str(threads)]
+    cmd += [
         '-y',  # Overwrite output file
         output_abs
     ]
@@ -49,6 +229,38 @@ def build_ffmpeg_command(input_path, output_path):
     return cmd
 
 
+def build_ffmpeg_batch_command(pairs, threads=None, encoder='x264'):
+    """
+    Builds one FFmpeg command encoding several files
+    
+    pairs is a list of (input_path, output_path). Every input gets its own output
+    with the same settings as build_ffmpeg_command; streams and metadata are
+    mapped explicitly so each output only takes its own input. Unlike ffmpeg's
+    default selection of a single-file encode (largest video, audio with most
+    channels), the first video and audio stream are mapped, which only differs
+    for files with several streams of a kind.
+    
+    threads is the limit for the whole process, split between the outputs.
+    """
+    if len(pairs) == 1:
+        return build_ffmpeg_command(pairs[0][0], pairs[0][1], threads, encoder)
+    
+    cmd = ['ffmpeg', '-hide_banner'] + PROGRESS_OPTIONS + ENCODER_GLOBAL_OPTIONS.get(encoder, [])
+    for input_path, _ in pairs:
+        cmd += ['-i', os.path.abspath(input_path)]
+    
+    # -threads applies per output, all outputs together stay within threads
+    output_threads = max(1, threads // len(pairs)) if threads else None
+    for index, (_, output_path) in enumerate(pairs):
+        cmd += ['-map', f'{index}:v:0?', '-map', f'{index}:a:0?']
+        cmd += get_encode_options(encoder) + ['-map_metadata', str(index)]
+        if output_threads:
+            cmd += ['-threads', str(output_threads)]
+        cmd += ['-y', os.path.abspath(output_path)]
+    
+    return cmd
+
+
 def preserve_file_timestamp(source_path, destination_path):
     """
     Preserves the modification time (mtime) of the source file to the destination file
@@ -64,7 +276,7 @@ def preserve_file_timestamp(source_path, destination_path):
         # Use touch -r command to preserve timestamp
         result = subprocess.run([
             'touch', '-r', source_path, destination_path
-        ], capture_output=True, text=True, timeout=10)
+        ], capture_output=True, timeout=10)
         
         return result.returncode == 0
         
@@ -78,6 +290,130 @@ def preserve_file_timestamp(source_path, destination_path):
             return False
 
 
+# Extended attribute on encoded outputs: "<source SHA-1> <settings digest> <source name>"
+ENCODE_KEY_XATTR = 'user.immich.encode_key'
+
+# ioctl request to share file data (reflink) on btrfs/xfs
+FICLONE = 0x40049409
+
+
+def get_source_hash(file_path):
+    """Calculates SHA-1 of file (identifies the source of encoded output)"""
+    hash_sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hash_sha1.update(chunk)
+    return hash_sha1.hexdigest()
+
+
+def get_settings_hash(encoder='x264'):
+    """Calculates digest of FFmpeg output options of encoder, outputs are only reused for equal settings"""
+    return hashlib.sha1('\0'.join(get_encode_options(encoder)).encode()).hexdigest()[:16]
+
+
+def mark_encoded_output(source_path, output_path, source_hash=None, encoder='x264'):
+    """
+    Stores source hash and encoder settings in output xattr, so the encode can be reused (see find_encoded_copy)
+    
+    source_hash is calculated if not given (None), after xattr support is checked.
+    
+    Returns:
+        bool: True if successful, False if filesystem or platform has no xattr support
+    """
+    # xattr functions exist only on Linux
+    if not hasattr(os, 'setxattr'):
+        return False
+    key = f"{get_settings_hash(encoder)} {os.path.basename(source_path)}"
+    try:
+        if source_hash is None:
+            # Probe filesystem before reading the whole source, placeholder hash never matches
+            os.setxattr(output_path, ENCODE_KEY_XATTR, f"- {key}".encode())
+            source_hash = get_source_hash(source_path)
+        os.setxattr(output_path, ENCODE_KEY_XATTR, f"{source_hash} {key}".encode())
+        return True
+    except OSError:
+        return False
+
+
+def read_encoded_outputs(directory, names):
+    """
+    Reads ENCODE_KEY_XATTR of every file in directory, once per directory
+    
+    Returns:
+        dict: {source name: [(output name, source hash, settings hash)]}
+    """
+    outputs = defaultdict(list)
+    for name in names:
+        try:
+            value = os.getxattr(os.path.join(directory, name), ENCODE_KEY_XATTR).decode()
+        except (OSError, AttributeError):
+            continue
+        parts = value.split(' ', 2)
+        if len(parts) == 3:
+            outputs[parts[2]].append((name, parts[0], parts[1]))
+    return outputs
+
+
+def find_encoded_copy(source_path, encoded_outputs, encoder='x264', source_hash=None, verify=True):
+    """
+    Finds existing encoded output of source file made with the same encoder settings
+    
+    encoded_outputs is read_encoded_outputs of the source directory. Source is
+    hashed only if one of its outputs has matching settings. With verify=False
+    (dry run) source is not hashed and first output with matching settings is returned.
+    
+    Returns:
+        tuple: (path of encoded copy or None, source hash or None if not calculated)
+    """
+    source = Path(source_path)
+    settings_hash = get_settings_hash(encoder)
+    for name, candidate_hash, candidate_settings in encoded_outputs.get(source.name, ()):
+        if candidate_settings != settings_hash:
+            continue
+        if not verify:
+            return str(source.with_name(name)), source_hash
+        if source_hash is None:
+            source_hash = get_source_hash(source_path)
+        if candidate_hash == source_hash:
+            return str(source.with_name(name)), source_hash
+    return None, source_hash
+
+
+def link_encoded_copy(existing_path, output_path):
+    """
+    Materializes existing encoded file under new name without encoding
+    
+    Uses hardlink, then reflink (FICLONE), then plain copy. Reflink and copy
+    go to a temporary file that replaces output only when complete.
+    """
+    try:
+        os.link(existing_path, output_path)
+        return
+    except OSError:
+        pass
+    
+    temp_fd, temp_path = tempfile.mkstemp(
+        suffix='.mp4',
+        dir=os.path.dirname(output_path),
+        prefix=f"{Path(output_path).stem}_"
+    )
+    try:
+        with open(existing_path, 'rb') as src, open(temp_fd, 'wb') as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            except OSError:
+                shutil.copyfileobj(src, dst)
+        shutil.copystat(existing_path, temp_path)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        # Partial copy (ENOSPC, Ctrl+C) must not stay as finished output
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
 def get_output_path(original_path, suffix="_encoded"):
     """Generates output file path (adds suffix and changes extension to .mp4)"""
     path_obj = Path(original_path)
@@ -87,14 +423,19 @@ def get_output_path(original_path, suffix="_encoded"):
     return str(output_path)
 
 
-def encode_video_file(input_path: str, output_path: str, dry_run: bool = False) -> dict:
+def encode_video_file(input_path: str, output_path: str, dry_run: bool = False, threads: int = None,
+                      original_size: int = None, encoder: str = 'x264', source_hash: str = None) -> dict:
     """
-    Encode single video file using FFmpeg via Docker with atomic write
+    Encode single video file using FFmpeg with atomic write
     
     Args:
         input_path: Path to the input video file
         output_path: Path to the output video file
         dry_run: If True, don't actually encode the file
+        threads: Number of encoder threads (default: ffmpeg decides)
+        original_size: Size of the input file if already known (skips stat)
+        encoder: Video encoder, key of ENCODERS
+        source_hash: SHA-1 of the input file if already known (see mark_encoded_output)
         
     Returns:
         dict: Result dictionary with success status, file sizes, duration, error info
@@ -106,12 +447,15 @@ def encode_video_file(input_path: str, output_path: str, dry_run: bool = False)
         'error': None,
         'original_size': 0,
         'output_size': 0,
-        'duration': 0
+        'duration': 0,
+        'media_duration': 0
     }
     
     try:
         # Get original file size
-        if os.path.exists(input_path):
+        if original_size is not None:
+            result['original_size'] = original_size
+        elif os.path.exists(input_path):
             result['original_size'] = os.path.getsize(input_path)
         
         if dry_run:
@@ -133,28 +477,32 @@ def encode_video_file(input_path: str, output_path: str, dry_run: bool = False)
         
         try:
             # Build FFmpeg command with temporary file
-            cmd = build_ffmpeg_command(input_path, temp_path)
+            cmd = build_ffmpeg_command(input_path, temp_path, threads, encoder)
             
             # Start encoding
             start_time = time.time()
-            process = subprocess.run(
+            process = run_ffmpeg(
                 cmd,
-                capture_output=True,
-                text=True,
-                timeout=3600  # Maximum 1 hour per file
+                timeout=3600,  # Maximum 1 hour per file
+                text=True
             )
             
             result['duration'] = time.time() - start_time
             
+            # Encoded media length, lets callers report encoding speed
+            out_time_us = parse_ffmpeg_progress(process.stdout).get('out_time_us', '')
+            if out_time_us.isdigit():
+                result['media_duration'] = int(out_time_us) / 1000000
+            
             if process.returncode == 0:
                 if os.path.exists(temp_path):
                     # Atomically move temporary file to final location
-                    temp_size = os.path.getsize(temp_path)
+                    result['output_size'] = os.path.getsize(temp_path)
                     shutil.move(temp_path, output_path)
-                    result['output_size'] = os.path.getsize(output_path)
                     
                     # Preserve original file timestamp
                     preserve_file_timestamp(input_path, output_path)
+                    mark_encoded_output(input_path, output_path, source_hash, encoder)
                     
                     result['success'] = True
                 else:
@@ -175,4 +523,114 @@ def encode_video_file(input_path: str, output_path: str, dry_run: bool = False)
     except Exception as e:
         result['error'] = str(e)
     
-    return result
\ No newline at end of file
+    return result
+
+
+def encode_video_files(pairs, dry_run: bool = False, threads: int = None, original_sizes: list = None,
+                       encoder: str = 'x264', source_hashes: list = None) -> list:
+    """
+    Encode several video files with one FFmpeg process (amortizes process and codec setup)
+    
+    Args:
+        pairs: List of (input_path, output_path)
+        dry_run: If True, don't actually encode the files
+        threads: Number of encoder threads per ffmpeg process, split between outputs of a batch
+            (default: ffmpeg decides)
+        original_sizes: Sizes of the input files if already known (skips stat)
+        encoder: Video encoder, key of ENCODERS
+        source_hashes: SHA-1 of the input files if already known (None items are calculated)
+        
+    Returns:
+        list: Result dictionaries (see encode_video_file), one per pair.
+        If the batch fails, files are encoded one by one so that errors
+        are attributed to the right file.
+    """
+    if original_sizes is None:
+        original_sizes = [None] * len(pairs)
+    if source_hashes is None:
+        source_hashes = [None] * len(pairs)
+    
+    if dry_run or len(pairs) == 1:
+        return [
+            encode_video_file(input_path, output_path, dry_run, threads, original_size, encoder, source_hash)
+            for (input_path, output_path), original_size, source_hash in zip(pairs, original_sizes, source_hashes)
+        ]
+    
+    results = []
+    temp_paths = []
+    batch_ok = False
+    
+    try:
+        for (input_path, output_path), original_size in zip(pairs, original_sizes):
+            if original_size is None:
+                original_size = os.path.getsize(input_path) if os.path.exists(input_path) else 0
+            results.append({
+                'input_path': input_path,
+                'output_path': output_path,
+                'success': False,
+                'error': None,
+                'original_size': original_size,
+                'output_size': 0,
+                'duration': 0,
+                'media_duration': 0
+            })
+            
+            # Create temporary file in the same directory as final file
+            output_dir = os.path.dirname(output_path)
+            os.makedirs(output_dir, exist_ok=True)
+            temp_fd, temp_path = tempfile.mkstemp(
+                suffix='.mp4',
+                dir=output_dir,
+                prefix=f"{Path(output_path).stem}_"
+            )
+            os.close(temp_fd)
+            temp_paths.append(temp_path)
+        
+        cmd = build_ffmpeg_batch_command([(input_path, temp_path) for (input_path, _), temp_path in zip(pairs, temp_paths)], threads, encoder)
+        
+        start_time = time.time()
+        process = run_ffmpeg(
+            cmd,
+            timeout=3600 * len(pairs)  # Maximum 1 hour per file
+        )
+        duration = time.time() - start_time
+        
+        if process.returncode == 0 and all(os.path.exists(temp_path) for temp_path in temp_paths):
+            for result, temp_path, source_hash in zip(results, temp_paths, source_hashes):
+                # Atomically move temporary file to final location
+                result['output_size'] = os.path.getsize(temp_path)
+                shutil.move(temp_path, result['output_path'])
+                
+                # Preserve original file timestamp
+                preserve_file_timestamp(result['input_path'], result['output_path'])
+                mark_encoded_output(result['input_path'], result['output_path'], source_hash, encoder)
+                
+                # Outputs are encoded together, each one reports the batch time
+                result['duration'] = duration
+                result['success'] = True
+            batch_ok = True
+            
+    except (subprocess.TimeoutExpired, OSError):
+        pass
+    
+    finally:
+        # Clean up temporary files if they remain
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass  # Ignore deletion errors
+    
+    if batch_ok:
+        return results
+    
+    # Encode files one by one to find out which ones fail
+    single_results = []
+    for index, (input_path, output_path) in enumerate(pairs):
+        if index < len(results) and results[index]['success']:
+            single_results.append(results[index])
+        else:
+            single_results.append(encode_video_file(input_path, output_path, False, threads, original_sizes[index], encoder,
+                                                    source_hashes[index]))
+    return single_results
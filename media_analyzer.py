@@ -4,7 +4,7 @@ Media Analyzer
 
 Program for recursive analysis of video and image files in directory.
 Extracts metadata (codec, resolution, bitrate, duration for videos; 
-EXIF data and resolution for images) using ffprobe and PIL/Pillow
+EXIF data and resolution for images) using PyAV (or ffprobe) and PIL/Pillow
 and saves results to SQLite database.
 
 Usage:
@@ -15,41 +15,311 @@ python media_analyzer.py test --stats
 python media_analyzer.py /data --pattern "Camera Uploads" --workers 8
 
 python media_analyzer.py /data --pattern ".jpg" --skip-hash
+
+python media_analyzer.py /data --backend ffprobe
 """
 
 import os
 import argparse
 import sqlite3
 from pathlib import Path
-from typing import Dict, Optional, List
-from datetime import datetime
+from typing import Dict, Optional, List, Tuple, Iterator
 from colorama import Fore, Style, init
 from tqdm import tqdm
 import hashlib
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+import multiprocessing
+import queue
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image
 from PIL.ExifTags import TAGS
 
 # Import from local library
-from lib.metadata import get_image_metadata, get_video_metadata, VideoMetadataError, VideoCorruptedError, VideoTimeoutError, VideoNoStreamError
+from lib.metadata import get_image_metadata, get_video_metadata, VIDEO_BACKENDS, DEFAULT_VIDEO_BACKEND, PYAV_AVAILABLE, VideoMetadataError, VideoCorruptedError, VideoTimeoutError, VideoNoStreamError
 from lib.utils import VIDEO_EXTENSIONS, RAW_EXTENSIONS, IMAGE_EXTENSIONS, SUPPORTED_EXTENSIONS
+from lib.db import connect, ensure_path_columns, has_statistics
 
 # Initialize colorama with forced colors for container support
 init(autoreset=True, strip=False)
 
+# Maximum number of discovered files waiting to be submitted to workers
+FILE_QUEUE_SIZE = 1024
+
+# Maximum number of rows saved to database in one transaction
+WRITE_BATCH_SIZE = 500
+
+# Columns saved for each media file, in the order of rows built by MediaAnalyzer.media_row()
+MEDIA_COLUMNS = (
+    'file_path', 'file_name', 'file_size', 'file_hash', 'modified_at',
+    'media_type', 'creation_date',
+    'duration', 'width', 'height', 'codec_name', 'codec_long_name',
+    'bit_rate', 'frame_rate', 'format_name', 'format_long_name',
+    'is_corrupted', 'error_message'
+)  # analyzed_at is filled by its DEFAULT CURRENT_TIMESTAMP
+
+# Built once, so the writer connection's statement cache always gets the same SQL
+INSERT_MEDIA_SQL = (
+    f"INSERT OR REPLACE INTO media_files ({', '.join(MEDIA_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(MEDIA_COLUMNS))})"
+)
+
+def _worker_context():
+    """
+    Returns multiprocessing context for analysis workers
+    
+    Workers are persistent: each one is forked once from a forkserver process
+    with metadata libraries already imported and then analyzes files until the
+    run ends. With the PyAV backend no process is started per file at all.
+    The forkserver also keeps workers from being forked while the discovery
+    and writer threads of this process hold locks.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return None
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['lib.metadata', 'lib.utils', 'PIL.Image'])
+    return context
+
+
+def _worker_init():
+    """Initializes worker process, Ctrl+C is handled by the main process"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def get_file_hash(file_path: str) -> Optional[str]:
+    """Calculates MD5 hash of file for uniqueness check"""
+    try:
+        hash_md5 = hashlib.md5()
+        with open(file_path, "rb") as f:
+            # Read file in chunks for large files
+            for chunk in iter(lambda: f.read(4096), b""):
+                hash_md5.update(chunk)
+        return hash_md5.hexdigest()
+    except Exception as e:
+        print(f"{Fore.YELLOW}Hash calculation error for {file_path}: {e}{Style.RESET_ALL}")
+        return None
+
+def analyze_image_file(file_path: str) -> Dict:
+    """Analyzes image file using PIL/Pillow and exiftool via Docker for metadata"""
+    try:
+        file_ext = Path(file_path).suffix.lower()
+
+        # Initialize basic metadata structure
+        metadata = {
+            'is_corrupted': False,
+            'media_type': 'image',
+            'width': None,
+            'height': None,
+            'format_name': file_ext[1:] if file_ext else None,  # Remove dot
+            'format_long_name': f"{file_ext[1:].upper()} Image" if file_ext else "Unknown Image",
+            'creation_date': None
+        }
+
+        # For RAW files, we use exiftool for everything (including dimensions if available)
+        if file_ext in RAW_EXTENSIONS:
+            # Get creation date using exiftool via Docker
+            exif_metadata = get_image_metadata(file_path)
+            if 'creation_date' in exif_metadata:
+                metadata['creation_date'] = exif_metadata['creation_date']
+
+            # Update format info for RAW files
+            metadata['format_long_name'] = f"{file_ext[1:].upper()} RAW Image"
+
+            return metadata
+
+        # For non-RAW files, use PIL for dimensions and format, exiftool for creation date
+        try:
+            with Image.open(file_path) as img:
+                metadata.update({
+                    'width': img.width,
+                    'height': img.height,
+                    'format_name': img.format.lower() if img.format else file_ext[1:],
+                    'format_long_name': f"{img.format} Image" if img.format else f"{file_ext[1:].upper()} Image"
+                })
+        except Exception as pil_error:
+            # Check if this is a critical corruption that should mark the file as corrupted
+            error_str = str(pil_error).lower()
+            critical_errors = [
+                'truncated file read',
+                'broken data stream',
+                'cannot identify image file',
+                'image file is truncated',
+                'decoder error',
+                'corrupt jpeg data',
+                'invalid image file'
+            ]
+
+            # Check if this is a critical error that indicates file corruption
+            is_critical = any(critical_error in error_str for critical_error in critical_errors)
+
+            if is_critical:
+                # Mark as corrupted for critical PIL errors
+                metadata['is_corrupted'] = True
+                metadata['error_message'] = f"Critical image corruption: {str(pil_error)}"
+            else:
+                # Non-critical PIL error, continue with exiftool
+                metadata['error_message'] = f"PIL error (continuing with exiftool): {str(pil_error)}"
+
+        # Only try exiftool if the file is not marked as corrupted
+        if not metadata.get('is_corrupted'):
+            # Get creation date using exiftool via Docker (works for both RAW and regular images)
+            try:
+                exif_metadata = get_image_metadata(file_path)
+                if 'creation_date' in exif_metadata:
+                    metadata['creation_date'] = exif_metadata['creation_date']
+            except Exception as exif_error:
+                # If exiftool also fails and PIL already failed, mark as corrupted
+                if metadata.get('error_message'):
+                    metadata['is_corrupted'] = True
+                    metadata['error_message'] += f" | Exiftool also failed: {str(exif_error)}"
+
+        return metadata
+
+    except Exception as e:
+        return {
+            'is_corrupted': True,
+            'error_message': f"Image analysis error: {str(e)}",
+            'media_type': 'image'
+        }
+
+
+def process_single_file(file_path: str, file_size: Optional[int] = None, modified_at: Optional[float] = None,
+                        processed_mtime: Optional[float] = None,
+                        video_backend: str = DEFAULT_VIDEO_BACKEND, skip_hash: bool = False) -> Dict[str, any]:
+    """
+    Processes single media file (video or image) and returns result
+    
+    Runs in a worker process, so the database is not touched here: metadata,
+    file stats and hash are returned to the main process which saves them.
+    file_size and modified_at come from the directory scan (os.stat is called if not given),
+    processed_mtime is modified_at of the file already stored in database (if any).
+    """
+    result = {
+        'file_path': file_path,
+        'processed': False,
+        'skipped': False,
+        'corrupted': False,
+        'error': False,
+        'error_message': None,
+        'metadata': None,
+        'file_size': None,
+        'modified_at': None,
+        'file_hash': None
+    }
+    
+    try:
+        # Check if file needs to be processed
+        if modified_at is None:
+            file_stats = os.stat(file_path)
+            file_size, modified_at = file_stats.st_size, file_stats.st_mtime
+        result['file_size'] = file_size
+        result['modified_at'] = modified_at
+        
+        if processed_mtime is not None and processed_mtime >= modified_at:
+            result['skipped'] = True
+            return result
+        
+        # Determine file type and analyze accordingly
+        file_ext = Path(file_path).suffix.lower()
+        
+        if file_ext in VIDEO_EXTENSIONS:
+            try:
+                metadata = get_video_metadata(file_path, backend=video_backend)
+                # Add metadata that MediaAnalyzer expects
+                metadata['is_corrupted'] = False
+                metadata['media_type'] = 'video'
+                metadata['error_message'] = None
+            except VideoCorruptedError as e:
+                metadata = {
+                    'is_corrupted': True,
+                    'error_message': str(e),
+                    'media_type': 'video'
+                }
+            except VideoTimeoutError as e:
+                metadata = {
+                    'is_corrupted': True,
+                    'error_message': str(e),
+                    'media_type': 'video'
+                }
+            except VideoNoStreamError as e:
+                metadata = {
+                    'is_corrupted': True,
+                    'error_message': str(e),
+                    'media_type': 'video'
+                }
+            except VideoMetadataError as e:
+                metadata = {
+                    'is_corrupted': True,
+                    'error_message': str(e),
+                    'media_type': 'video'
+                }
+        elif file_ext in IMAGE_EXTENSIONS:
+            metadata = analyze_image_file(file_path)
+        else:
+            raise ValueError(f"Unsupported file type: {file_ext}")
+        
+        if not metadata.get('is_corrupted') and not skip_hash:
+            result['file_hash'] = get_file_hash(file_path)
+        
+        result['metadata'] = metadata
+        result['processed'] = True
+        if metadata.get('is_corrupted'):
+            result['corrupted'] = True
+            result['error_message'] = metadata.get('error_message')
+        
+    except Exception as e:
+        result['error'] = True
+        result['error_message'] = str(e)
+        
+        # Save error information (only possible if file stats are known)
+        if result['file_size'] is not None:
+            result['metadata'] = {
+                'is_corrupted': True,
+                'error_message': f"Processing error: {str(e)}",
+                'media_type': 'video' if Path(file_path).suffix.lower() in VIDEO_EXTENSIONS else 'image'
+            }
+    
+    return result
+
+
+def _scan_files(directory: str):
+    """
+    Yields DirEntry of every file in directory tree (same order as os.walk)
+    
+    Directories starting with dot are skipped, symlinks to directories are not followed.
+    """
+    stack = [directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                subdirs = []
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        yield entry
+                    elif not entry.name.startswith('.') and not entry.is_symlink():
+                        subdirs.append(entry.path)
+        except OSError:
+            continue
+        # Reversed so that subdirectories are visited in listing order
+        stack.extend(reversed(subdirs))
+
+
 class MediaAnalyzer:
     """Class for media file analysis (videos and images)"""
     
-    def __init__(self, db_path: str, skip_hash: bool = False):
+    def __init__(self, db_path: str, skip_hash: bool = False, video_backend: str = DEFAULT_VIDEO_BACKEND):
         self.db_path = db_path
         self.skip_hash = skip_hash
-        self.db_lock = Lock()  # For thread-safe database operations
+        self.video_backend = video_backend
         self.init_database()
     
     def init_database(self):
         """Initializes SQLite database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -84,363 +354,299 @@ class MediaAnalyzer:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_codec ON media_files(codec_name)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_resolution ON media_files(width, height)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_creation_date ON media_files(creation_date)')
+        # Covering indexes for --stats aggregates and top codecs/resolutions
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_valid_stats ON media_files(is_corrupted, media_type, file_size, duration)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_stats_res ON media_files(is_corrupted, width, height)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_stats_codec ON media_files(is_corrupted, media_type, codec_name)')
         
         conn.commit()
+        
+        # Directory and base name columns for suffix lookups in media_query
+        ensure_path_columns(conn)
         conn.close()
     
-    def get_file_hash(self, file_path: str) -> Optional[str]:
-        """Calculates MD5 hash of file for uniqueness check"""
-        try:
-            hash_md5 = hashlib.md5()
-            with open(file_path, "rb") as f:
-                # Read file in chunks for large files
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
-        except Exception as e:
-            print(f"{Fore.YELLOW}Hash calculation error for {file_path}: {e}{Style.RESET_ALL}")
-            return None
+    def get_processed_files(self) -> Dict[str, float]:
+        """Returns modification times of files already stored in database"""
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT file_path, modified_at FROM media_files')
+        processed_files = dict(cursor.fetchall())
+        
+        conn.close()
+        return processed_files
+    
+    def media_row(self, file_path: str, metadata: Dict, file_size: int, modified_at: float, file_hash: Optional[str] = None) -> tuple:
+        """Builds database row for media file information (video or image), see MEDIA_COLUMNS"""
+        return (
+            file_path,
+            file_path.rpartition(os.sep)[2],
+            file_size,
+            file_hash,
+            modified_at,
+            metadata.get('media_type'),
+            metadata.get('creation_date'),
+            metadata.get('duration'),
+            metadata.get('width'),
+            metadata.get('height'),
+            metadata.get('codec_name'),
+            metadata.get('codec_long_name'),
+            metadata.get('bit_rate'),
+            metadata.get('frame_rate'),
+            metadata.get('format_name'),
+            metadata.get('format_long_name'),
+            metadata.get('is_corrupted', False),
+            metadata.get('error_message')
+        )
     
-    def analyze_image_file(self, file_path: str) -> Dict:
-        """Analyzes image file using PIL/Pillow and exiftool via Docker for metadata"""
+    def save_media_rows(self, conn: sqlite3.Connection, rows: List[tuple]) -> int:
+        """
+        Saves batch of media file rows to database in one transaction
+        
+        Falls back to row by row inserts if the batch fails, so one bad row
+        doesn't lose the whole batch. Returns number of rows that failed.
+        """
         try:
-            file_ext = Path(file_path).suffix.lower()
-            
-            # Initialize basic metadata structure
-            metadata = {
-                'is_corrupted': False,
-                'media_type': 'image',
-                'width': None,
-                'height': None,
-                'format_name': file_ext[1:] if file_ext else None,  # Remove dot
-                'format_long_name': f"{file_ext[1:].upper()} Image" if file_ext else "Unknown Image",
-                'creation_date': None
-            }
-            
-            # For RAW files, we use exiftool for everything (including dimensions if available)
-            if file_ext in RAW_EXTENSIONS:
-                # Get creation date using exiftool via Docker
-                exif_metadata = get_image_metadata(file_path)
-                if 'creation_date' in exif_metadata:
-                    metadata['creation_date'] = exif_metadata['creation_date']
-                
-                # Update format info for RAW files
-                metadata['format_long_name'] = f"{file_ext[1:].upper()} RAW Image"
-                
-                return metadata
-            
-            # For non-RAW files, use PIL for dimensions and format, exiftool for creation date
+            conn.executemany(INSERT_MEDIA_SQL, rows)
+            conn.commit()
+            return 0
+        except sqlite3.Error:
+            conn.rollback()
+        
+        failed = 0
+        for row in rows:
             try:
-                with Image.open(file_path) as img:
-                    metadata.update({
-                        'width': img.width,
-                        'height': img.height,
-                        'format_name': img.format.lower() if img.format else file_ext[1:],
-                        'format_long_name': f"{img.format} Image" if img.format else f"{file_ext[1:].upper()} Image"
-                    })
-            except Exception as pil_error:
-                # Check if this is a critical corruption that should mark the file as corrupted
-                error_str = str(pil_error).lower()
-                critical_errors = [
-                    'truncated file read',
-                    'broken data stream',
-                    'cannot identify image file',
-                    'image file is truncated',
-                    'decoder error',
-                    'corrupt jpeg data',
-                    'invalid image file'
-                ]
-                
-                # Check if this is a critical error that indicates file corruption
-                is_critical = any(critical_error in error_str for critical_error in critical_errors)
+                conn.execute(INSERT_MEDIA_SQL, row)
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                failed += 1
+                print(f"\n{Fore.RED}Critical error processing {row[0]}: {e}{Style.RESET_ALL}")
+        return failed
+    
+    def write_results(self, result_queue: queue.Queue, write_errors: Dict[str, int]):
+        """DB writer thread: drains result queue and saves rows in batches until None is received"""
+        conn = connect(self.db_path)
+        saved = False
+        try:
+            while True:
+                # Block for the first row, then take whatever else is already queued
+                rows = [result_queue.get()]
+                while rows[-1] is not None and len(rows) < WRITE_BATCH_SIZE:
+                    try:
+                        rows.append(result_queue.get_nowait())
+                    except queue.Empty:
+                        break
                 
-                if is_critical:
-                    # Mark as corrupted for critical PIL errors
-                    metadata['is_corrupted'] = True
-                    metadata['error_message'] = f"Critical image corruption: {str(pil_error)}"
-                else:
-                    # Non-critical PIL error, continue with exiftool
-                    metadata['error_message'] = f"PIL error (continuing with exiftool): {str(pil_error)}"
+                finished = rows[-1] is None
+                if finished:
+                    rows.pop()
+                if rows:
+                    write_errors['count'] += self.save_media_rows(conn, rows)
+                    saved = True
+                if finished:
+                    break
             
-            # Only try exiftool if the file is not marked as corrupted
-            if not metadata.get('is_corrupted'):
-                # Get creation date using exiftool via Docker (works for both RAW and regular images)
+            if saved:
+                # The planner picks indexes by sqlite_stat1. A new database is analyzed once in full,
+                # later runs leave stale statistics to the bounded PRAGMA optimize of media_query.
                 try:
-                    exif_metadata = get_image_metadata(file_path)
-                    if 'creation_date' in exif_metadata:
-                        metadata['creation_date'] = exif_metadata['creation_date']
-                except Exception as exif_error:
-                    # If exiftool also fails and PIL already failed, mark as corrupted
-                    if metadata.get('error_message'):
-                        metadata['is_corrupted'] = True
-                        metadata['error_message'] += f" | Exiftool also failed: {str(exif_error)}"
-            
-            return metadata
-                
-        except Exception as e:
-            return {
-                'is_corrupted': True,
-                'error_message': f"Image analysis error: {str(e)}",
-                'media_type': 'image'
-            }
-
-
-    
-    def is_file_processed(self, file_path: str, file_modified_time: float) -> bool:
-        """Checks if file was already processed and hasn't changed"""
-        with self.db_lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT modified_at FROM media_files 
-                WHERE file_path = ? AND modified_at >= ?
-            ''', (file_path, file_modified_time))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            return result is not None
-    
-    def save_media_info(self, file_path: str, metadata: Dict):
-        """Saves media file information (video or image) to database"""
-        file_stats = os.stat(file_path)
-        file_hash = None
-        if not metadata.get('is_corrupted') and not self.skip_hash:
-            file_hash = self.get_file_hash(file_path)
-        
-        with self.db_lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO media_files (
-                    file_path, file_name, file_size, file_hash, modified_at,
-                    media_type, creation_date,
-                    duration, width, height, codec_name, codec_long_name,
-                    bit_rate, frame_rate, format_name, format_long_name,
-                    is_corrupted, error_message, analyzed_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                file_path,
-                os.path.basename(file_path),
-                file_stats.st_size,
-                file_hash,
-                file_stats.st_mtime,
-                metadata.get('media_type'),
-                metadata.get('creation_date'),
-                metadata.get('duration'),
-                metadata.get('width'),
-                metadata.get('height'),
-                metadata.get('codec_name'),
-                metadata.get('codec_long_name'),
-                metadata.get('bit_rate'),
-                metadata.get('frame_rate'),
-                metadata.get('format_name'),
-                metadata.get('format_long_name'),
-                metadata.get('is_corrupted', False),
-                metadata.get('error_message'),
-                datetime.now().isoformat()
-            ))
-            
-            conn.commit()
+                    if not has_statistics(conn, 'media_files'):
+                        conn.execute('ANALYZE media_files')
+                        conn.commit()
+                except sqlite3.Error:
+                    pass  # Statistics are optional, queries work without them
+        finally:
             conn.close()
     
-    def find_media_files(self, directory: str, pattern: Optional[str] = None) -> List[str]:
-        """Recursively finds all media files (videos and images) in directory"""
-        media_files = []
-        skipped_nonmedia_files = 0
-        skipped_pattern_files = 0
+    def find_media_files(self, directory: str, pattern: Optional[str] = None,
+                         skipped: Optional[Dict[str, int]] = None) -> Iterator[Tuple[str, Optional[int], Optional[float]]]:
+        """
+        Recursively finds all media files (videos and images) in directory
         
-        print(f"{Fore.BLUE}Searching for media files in {directory}...{Style.RESET_ALL}")
-        if pattern:
-            print(f"{Fore.BLUE}Pattern filter: '{pattern}'{Style.RESET_ALL}")
+        Yields (file_path, file_size, modified_at) tuples, stats are taken
+        from the directory scan (None if stat failed). Skipped files are
+        counted in skipped dict ('nonmedia' and 'pattern' keys) if given.
+        """
+        if skipped is None:
+            skipped = {'nonmedia': 0, 'pattern': 0}
         
-        for root, dirs, files in os.walk(directory):
-            # Skip system directories
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for entry in _scan_files(directory):
+            name = entry.name
+            # Skip system files (starting with dot)
+            if name.startswith('.'):
+                skipped['nonmedia'] += 1
+                continue
             
-            for file in files:
-                # Skip system files (starting with dot)
-                if file.startswith('.'):
-                    skipped_nonmedia_files += 1
-                    continue
-                
-                file_path = os.path.join(root, file)
-                file_ext = Path(file).suffix.lower()
-
-                if file_ext not in SUPPORTED_EXTENSIONS:
-                    skipped_nonmedia_files += 1
-                    continue
-                
-                if file_ext in SUPPORTED_EXTENSIONS:
-                    # Apply pattern filter if specified
-                    if pattern and pattern not in file_path:
-                        skipped_pattern_files += 1
-                        continue
-                    
-                    media_files.append(file_path)
-        
-        if skipped_nonmedia_files > 0:
-            print(f"{Fore.YELLOW}Skipped non-media files: {skipped_nonmedia_files}{Style.RESET_ALL}")
-        
-        if skipped_pattern_files > 0:
-            print(f"{Fore.YELLOW}Skipped files not matching pattern: {skipped_pattern_files}{Style.RESET_ALL}")
-        
-        return media_files
-    
-    def process_single_file(self, file_path: str, force_reanalyze: bool = False) -> Dict[str, any]:
-        """Processes single media file (video or image) and returns result"""
-        result = {
-            'file_path': file_path,
-            'processed': False,
-            'skipped': False,
-            'corrupted': False,
-            'error': False,
-            'error_message': None
-        }
-        
-        try:
-            # Check if file needs to be processed
-            file_stats = os.stat(file_path)
+            _, dot, ext = name.rpartition('.')
+            file_ext = '.' + ext.lower() if dot else ''
             
-            if not force_reanalyze and self.is_file_processed(file_path, file_stats.st_mtime):
-                result['skipped'] = True
-                return result
+            if file_ext not in SUPPORTED_EXTENSIONS:
+                skipped['nonmedia'] += 1
+                continue
             
-            # Determine file type and analyze accordingly
-            file_ext = Path(file_path).suffix.lower()
+            # Apply pattern filter if specified
+            file_path = entry.path
+            if pattern and pattern not in file_path:
+                skipped['pattern'] += 1
+                continue
             
-            if file_ext in VIDEO_EXTENSIONS:
-                try:
-                    metadata = get_video_metadata(file_path)
-                    # Add metadata that MediaAnalyzer expects
-                    metadata['is_corrupted'] = False
-                    metadata['media_type'] = 'video'
-                    metadata['error_message'] = None
-                except VideoCorruptedError as e:
-                    metadata = {
-                        'is_corrupted': True,
-                        'error_message': str(e),
-                        'media_type': 'video'
-                    }
-                except VideoTimeoutError as e:
-                    metadata = {
-                        'is_corrupted': True,
-                        'error_message': str(e),
-                        'media_type': 'video'
-                    }
-                except VideoNoStreamError as e:
-                    metadata = {
-                        'is_corrupted': True,
-                        'error_message': str(e),
-                        'media_type': 'video'
-                    }
-                except VideoMetadataError as e:
-                    metadata = {
-                        'is_corrupted': True,
-                        'error_message': str(e),
-                        'media_type': 'video'
-                    }
-            elif file_ext in IMAGE_EXTENSIONS:
-                metadata = self.analyze_image_file(file_path)
-            else:
-                raise ValueError(f"Unsupported file type: {file_ext}")
-            
-            # Save to database
-            self.save_media_info(file_path, metadata)
-            
-            result['processed'] = True
-            if metadata.get('is_corrupted'):
-                result['corrupted'] = True
-                result['error_message'] = metadata.get('error_message')
-            
-        except Exception as e:
-            result['error'] = True
-            result['error_message'] = str(e)
-            
-            # Save error information
-            error_metadata = {
-                'is_corrupted': True,
-                'error_message': f"Processing error: {str(e)}",
-                'media_type': 'video' if Path(file_path).suffix.lower() in VIDEO_EXTENSIONS else 'image'
-            }
+            # DirEntry caches stat result, so no extra syscall is needed later
             try:
-                self.save_media_info(file_path, error_metadata)
-            except:
-                pass
-        
-        return result
+                file_stats = entry.stat()
+                yield file_path, file_stats.st_size, file_stats.st_mtime
+            except OSError:
+                yield file_path, None, None
+    
+    def discover_files(self, directory: str, pattern: Optional[str], max_files: Optional[int],
+                       skipped: Dict[str, int], file_queue: queue.Queue):
+        """Discovery thread: puts found media files to queue, None marks the end"""
+        try:
+            for found, item in enumerate(self.find_media_files(directory, pattern, skipped), 1):
+                file_queue.put(item)
+                if max_files and found >= max_files:
+                    break
+        finally:
+            file_queue.put(None)
     
     def analyze_directory(self, directory: str, force_reanalyze: bool = False, max_files: Optional[int] = None, max_workers: int = 4, pattern: Optional[str] = None):
-        """Analyzes all media files (videos and images) in directory"""
+        """
+        Analyzes all media files (videos and images) in directory
+        
+        Directory walk, file analysis and database writes run as a pipeline:
+        a discovery thread feeds found files to the process pool through a
+        bounded queue while a writer thread saves results in batches.
+        """
         if not os.path.exists(directory):
             print(f"{Fore.RED}Directory does not exist: {directory}{Style.RESET_ALL}")
             return
         
-        # Find all media files
-        media_files = self.find_media_files(directory, pattern)
-        
-        if not media_files:
-            if pattern:
-                print(f"{Fore.YELLOW}No media files found in {directory} matching pattern '{pattern}'{Style.RESET_ALL}")
-            else:
-                print(f"{Fore.YELLOW}No media files found in {directory}{Style.RESET_ALL}")
-            return
-        
-        if max_files:
-            media_files = media_files[:max_files]
-        
-        print(f"{Fore.GREEN}Found {len(media_files)} media files{Style.RESET_ALL}")
-        print(f"{Fore.BLUE}Using {max_workers} threads for processing{Style.RESET_ALL}")
+        print(f"{Fore.BLUE}Searching for media files in {directory}...{Style.RESET_ALL}")
+        if pattern:
+            print(f"{Fore.BLUE}Pattern filter: '{pattern}'{Style.RESET_ALL}")
+        print(f"{Fore.BLUE}Using {max_workers} processes for processing{Style.RESET_ALL}")
         if self.skip_hash:
             print(f"{Fore.YELLOW}MD5 hash calculation disabled for faster processing{Style.RESET_ALL}")
         
         # Statistics
+        found = 0
         processed = 0
         skipped = 0
         corrupted = 0
         errors = 0
+        skipped_files = {'nonmedia': 0, 'pattern': 0}
+        write_errors = {'count': 0}
         
-        # Parallel file processing
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            with tqdm(total=len(media_files), desc="Analyzing media files", unit="files") as pbar:
-                # Submit all tasks to thread pool
-                future_to_file = {
-                    executor.submit(self.process_single_file, file_path, force_reanalyze): file_path 
-                    for file_path in media_files
-                }
-                
-                # Process completed tasks
-                for future in as_completed(future_to_file):
-                    file_path = future_to_file[future]
+        # Modification times of already analyzed files, loaded once instead of a query per file
+        processed_files = {} if force_reanalyze else self.get_processed_files()
+        
+        file_queue = queue.Queue(maxsize=FILE_QUEUE_SIZE)
+        result_queue = queue.Queue()
+        discovery_thread = threading.Thread(
+            target=self.discover_files,
+            args=(directory, pattern, max_files, skipped_files, file_queue),
+            daemon=True
+        )
+        writer_thread = threading.Thread(target=self.write_results, args=(result_queue, write_errors))
+        discovery_thread.start()
+        writer_thread.start()
+        
+        # Limit number of submitted tasks so memory doesn't grow with directory size
+        max_pending = max_workers * 4
+        
+        try:
+            # Parallel file processing, database writes are done by the writer thread only
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=_worker_context(), initializer=_worker_init) as executor:
+                with tqdm(desc="Analyzing media files", unit="files") as pbar:
+                    future_to_file = {}
+                    discovering = True
                     
-                    try:
-                        result = future.result()
+                    while discovering or future_to_file:
+                        # Submit discovered files to process pool
+                        while discovering and len(future_to_file) < max_pending:
+                            try:
+                                item = file_queue.get(block=not future_to_file)
+                            except queue.Empty:
+                                break
+                            
+                            if item is None:
+                                # Directory walk finished, total is known now
+                                discovering = False
+                                pbar.total = found
+                                pbar.refresh()
+                                break
+                            
+                            found += 1
+                            file_path, file_size, modified_at = item
+                            future = executor.submit(
+                                process_single_file, file_path, file_size, modified_at,
+                                processed_files.get(file_path), self.video_backend, self.skip_hash
+                            )
+                            future_to_file[future] = file_path
                         
-                        if result['processed']:
-                            processed += 1
-                            if result['corrupted']:
-                                corrupted += 1
-                                print(f"\n{Fore.RED}Corrupted file: {file_path} - {result['error_message']}{Style.RESET_ALL}")
-                        elif result['skipped']:
-                            skipped += 1
-                        elif result['error']:
-                            errors += 1
-                            print(f"\n{Fore.RED}Processing error {file_path}: {result['error_message']}{Style.RESET_ALL}")
+                        if not future_to_file:
+                            continue
                         
-                    except Exception as e:
-                        errors += 1
-                        print(f"\n{Fore.RED}Critical error processing {file_path}: {e}{Style.RESET_ALL}")
-                    
-                    # Update progress bar
-                    pbar.set_postfix(
-                        processed=processed, 
-                        skipped=skipped, 
-                        corrupted=corrupted, 
-                        errors=errors
-                    )
-                    pbar.update(1)
+                        # Process completed tasks (poll while files are still being discovered)
+                        done, _ = wait(
+                            future_to_file,
+                            timeout=0.1 if discovering else None,
+                            return_when=FIRST_COMPLETED
+                        )
+                        for future in done:
+                            file_path = future_to_file.pop(future)
+                            
+                            try:
+                                result = future.result()
+                                
+                                if result['metadata'] is not None:
+                                    result_queue.put(self.media_row(
+                                        file_path, result['metadata'],
+                                        result['file_size'], result['modified_at'], result['file_hash']
+                                    ))
+                                
+                                if result['processed']:
+                                    processed += 1
+                                    if result['corrupted']:
+                                        corrupted += 1
+                                        print(f"\n{Fore.RED}Corrupted file: {file_path} - {result['error_message']}{Style.RESET_ALL}")
+                                elif result['skipped']:
+                                    skipped += 1
+                                elif result['error']:
+                                    errors += 1
+                                    print(f"\n{Fore.RED}Processing error {file_path}: {result['error_message']}{Style.RESET_ALL}")
+                                
+                            except Exception as e:
+                                errors += 1
+                                print(f"\n{Fore.RED}Critical error processing {file_path}: {e}{Style.RESET_ALL}")
+                            
+                            # Update progress bar, postfix is painted on tqdm's own refresh cadence
+                            pbar.set_postfix_str(
+                                f"corrupted={corrupted}, errors={errors}, processed={processed}, skipped={skipped}",
+                                refresh=False
+                            )
+                            pbar.update(1)
+        finally:
+            # Let the writer save everything received so far
+            result_queue.put(None)
+            writer_thread.join()
+        
+        errors += write_errors['count']
+        
+        if skipped_files['nonmedia'] > 0:
+            print(f"{Fore.YELLOW}Skipped non-media files: {skipped_files['nonmedia']}{Style.RESET_ALL}")
+        
+        if skipped_files['pattern'] > 0:
+            print(f"{Fore.YELLOW}Skipped files not matching pattern: {skipped_files['pattern']}{Style.RESET_ALL}")
+        
+        if not found:
+            if pattern:
+                print(f"{Fore.YELLOW}No media files found in {directory} matching pattern '{pattern}'{Style.RESET_ALL}")
+            else:
+                print(f"{Fore.YELLOW}No media files found in {directory}{Style.RESET_ALL}")
+            return
+        
+        print(f"{Fore.GREEN}Found {found} media files{Style.RESET_ALL}")
         
         # Output final statistics
         print(f"\n{Fore.GREEN}Analysis completed!{Style.RESET_ALL}")
@@ -451,27 +657,23 @@ class MediaAnalyzer:
     
     def get_statistics(self) -> Dict:
         """Gets statistics from database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
-        # General statistics
-        cursor.execute('SELECT COUNT(*) FROM media_files')
-        total_files = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM media_files WHERE media_type = "video"')
-        video_files = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM media_files WHERE media_type = "image"')
-        image_files = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM media_files WHERE is_corrupted = 1')
-        corrupted_files = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT SUM(file_size) FROM media_files WHERE is_corrupted = 0')
-        total_size = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT SUM(duration) FROM media_files WHERE is_corrupted = 0 AND media_type = "video"')
-        total_duration = cursor.fetchone()[0] or 0
+        # General statistics in one pass (covered by idx_valid_stats index)
+        cursor.execute('''
+            SELECT
+                COUNT(*),
+                COUNT(CASE WHEN media_type = 'video' THEN 1 END),
+                COUNT(CASE WHEN media_type = 'image' THEN 1 END),
+                COUNT(CASE WHEN is_corrupted = 1 THEN 1 END),
+                SUM(CASE WHEN is_corrupted = 0 THEN file_size END),
+                SUM(CASE WHEN is_corrupted = 0 AND media_type = 'video' THEN duration END)
+            FROM media_files
+        ''')
+        total_files, video_files, image_files, corrupted_files, total_size, total_duration = cursor.fetchone()
+        total_size = total_size or 0
+        total_duration = total_duration or 0
         
         # Top codecs (videos only)
         cursor.execute('''
@@ -512,7 +714,7 @@ class MediaAnalyzer:
 def main():
     """Main program function"""
     parser = argparse.ArgumentParser(
-        description='Media file analysis (videos and images) using ffprobe and PIL, saving to SQLite'
+        description='Media file analysis (videos and images) using PyAV/ffprobe and PIL, saving to SQLite'
     )
     parser.add_argument(
         'directory',
@@ -542,7 +744,7 @@ def main():
         '--workers', '-w',
         type=int,
         default=4,
-        help='Number of threads for parallel processing (default: 4)'
+        help='Number of worker processes for parallel processing (default: 4)'
     )
     parser.add_argument(
         '--skip-hash',
@@ -553,11 +755,20 @@ def main():
         '--pattern',
         help='Only process files containing specified pattern in path'
     )
+    parser.add_argument(
+        '--backend',
+        choices=VIDEO_BACKENDS,
+        default=DEFAULT_VIDEO_BACKEND,
+        help=f'Video metadata backend: in-process PyAV or ffprobe subprocess (default: {DEFAULT_VIDEO_BACKEND})'
+    )
     
     args = parser.parse_args()
     
+    if args.backend == 'pyav' and not PYAV_AVAILABLE:
+        parser.error("PyAV is not installed, install it with 'pip install av' or use --backend ffprobe")
+    
     # Initialize analyzer
-    analyzer = MediaAnalyzer(args.database, skip_hash=args.skip_hash)
+    analyzer = MediaAnalyzer(args.database, skip_hash=args.skip_hash, video_backend=args.backend)
     
     if args.stats:
         # Show statistics
@@ -19,83 +19,200 @@ import argparse
 import datetime
 import os
 import sys
+import time
+import atexit
+import functools
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from colorama import Fore, Style, init
 from collections import defaultdict
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional, plain substring search is used instead
+    ahocorasick = None
+
 # Import from local library
-from lib.utils import sort_files_by_directory_depth, RAW_EXTENSIONS, StripAnsiWriter
+from lib.utils import parse_datetime_from_path, RAW_EXTENSIONS, StripAnsiWriter
 from lib.video_converter import OUTDATED_CODECS, OUTDATED_FORMATS
-from lib.db import query_all_database
+from lib.db import (connect, read_transaction, query_all_database, ensure_path_columns, ensure_duplicate_hashes,
+                    directory_order_sql, DIR_PATH_SQL, BASE_NO_EXT_SQL, DUPLICATE_GROUPS_SQL)
 
 # Initialize colorama with forced colors for container support
 init(autoreset=True, strip=False)
 
+# Indexes for ORDER BY ... LIMIT reports and exports
+QUERY_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_query_size ON media_files(file_size)',
+    # Covers EXPORT_STATS_SQL of the files list
+    'CREATE INDEX IF NOT EXISTS idx_query_bitrate ON media_files(is_corrupted, bit_rate, file_size, duration, media_type)',
+    'CREATE INDEX IF NOT EXISTS idx_query_duration ON media_files(is_corrupted, duration)',
+    'CREATE INDEX IF NOT EXISTS idx_file_hash ON media_files(file_hash)',
+    # Partial and covering for DUPLICATE_GROUPS_SQL: GROUP BY walks it without a temp B-tree
+    "CREATE INDEX IF NOT EXISTS idx_query_valid_hash ON media_files(is_corrupted, file_hash, file_size) "
+    "WHERE file_hash IS NOT NULL AND file_hash != ''",
+    'CREATE INDEX IF NOT EXISTS idx_query_no_metadata ON media_files(creation_date, is_corrupted)',
+]
+
+# Databases whose indexes were created by this process
+_indexed_databases = set()
+_indexed_databases_lock = threading.Lock()
+
+def _open(db_path):
+    """
+    Opens database connection with lib.db CONNECTION_PRAGMAS
+    
+    Query indexes are created once per process and database, all in one
+    transaction so a failure (e.g. database locked by media_analyzer) doesn't
+    leave a replaced index dropped. A read-only database is used as is.
+    """
+    conn = connect(db_path, check_same_thread=False)
+    cursor = conn.cursor()
+    
+    with _indexed_databases_lock:
+        if db_path not in _indexed_databases:
+            try:
+                cursor.execute('BEGIN')
+                for index_sql in QUERY_INDEXES:
+                    cursor.execute(index_sql)
+                conn.commit()
+                _indexed_databases.add(db_path)
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                if getattr(e, 'sqlite_errorname', None) != 'SQLITE_READONLY':
+                    print(f"{Fore.YELLOW}Warning: Cannot create query indexes in {db_path}: {e}{Style.RESET_ALL}")
+    
+    return conn
+
+# Rows per index examined by PRAGMA optimize at exit (approximate statistics)
+ANALYSIS_LIMIT = 1000
+
+# Connections opened by _get_conn, closed at exit
+_connections = []
+_thread_connections = threading.local()
+
+def _get_conn(db_path):
+    """
+    Returns connection to database, shared by all queries of the calling thread
+    
+    Reusing the connection keeps SQLite page cache warm between reports.
+    Every thread gets its own connection, so reports can be queried concurrently.
+    """
+    connections = _thread_connections.__dict__.setdefault('by_path', {})
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = _open(db_path)
+        _connections.append(conn)
+    return conn
+
+@atexit.register
+def _close_all():
+    """
+    Closes connections opened by _get_conn
+    
+    PRAGMA optimize runs ANALYZE for queried tables whose statistics are
+    missing or stale (e.g. after QUERY_INDEXES were added), so the planner
+    has sqlite_stat1 to choose between the indexes in later runs.
+    ANALYSIS_LIMIT keeps it from scanning every index of a large table.
+    """
+    for conn in _connections:
+        try:
+            conn.execute(f'PRAGMA analysis_limit={ANALYSIS_LIMIT}')
+            conn.execute('PRAGMA optimize')
+        except sqlite3.OperationalError:
+            pass  # Read-only database
+        conn.close()
+    _connections.clear()
+
+# Export files are written in chunks of rows through a large buffer
+EXPORT_BUFFER_SIZE = 1 << 20
+EXPORT_CHUNK_ROWS = 4096
+
+# Separator line of export file headers and summaries
+SEPARATOR_LINE = "#" + "=" * 100 + "\n"
+
+BYTES_PER_MB = 1024 * 1024
+BPS_PER_MBPS = 1_000_000
+
+FILE_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+# Sizes, bitrates and durations repeat a lot across a library, so the
+# formatters below are cached. Their output does not depend on int vs float.
+
+@functools.lru_cache(maxsize=16384)
 def format_file_size(bytes_size):
     """Formats file size in human readable format"""
     if bytes_size is None:
         return "N/A"
-    
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if bytes_size < 1024.0:
-            return f"{bytes_size:.1f} {unit}"
-        bytes_size /= 1024.0
-    return f"{bytes_size:.1f} PB"
+    if bytes_size < 1024:
+        return f"{bytes_size:.1f} B"
+    # Unit index from integer log2 instead of dividing in a loop
+    unit = min((int(bytes_size).bit_length() - 1) // 10, 5)
+    return f"{bytes_size / (1 << (10 * unit)):.1f} {FILE_SIZE_UNITS[unit]}"
 
+@functools.lru_cache(maxsize=16384)
 def format_bitrate(bitrate):
     """Formats bitrate in human readable format"""
     if bitrate is None or bitrate == 0:
         return "N/A"
     
-    # Convert from bits/sec to Mbit/s
-    mbit_rate = bitrate / 1_000_000
-    
-    if mbit_rate < 1:
-        kbit_rate = bitrate / 1_000
-        return f"{kbit_rate:.1f} kbit/s"
-    elif mbit_rate < 1000:
-        return f"{mbit_rate:.1f} Mbit/s"
-    else:
-        gbit_rate = mbit_rate / 1000
-        return f"{gbit_rate:.1f} Gbit/s"
+    if bitrate < 1_000_000:
+        return f"{bitrate / 1_000:.1f} kbit/s"
+    if bitrate < 1_000_000_000:
+        return f"{bitrate / 1_000_000:.1f} Mbit/s"
+    # Via Mbit/s, as the other units
+    return f"{bitrate / 1_000_000 / 1000:.1f} Gbit/s"
 
+@functools.lru_cache(maxsize=4096)
 def format_duration(duration):
     """Formats duration in human readable format"""
     if duration is None or duration == 0:
         return "N/A"
     
-    hours = int(duration // 3600)
-    minutes = int((duration % 3600) // 60)
-    seconds = int(duration % 60)
+    hours, rest = divmod(int(duration), 3600)
+    minutes, seconds = divmod(rest, 60)
     
     if hours > 0:
         return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
     else:
         return f"{minutes:02d}:{seconds:02d}"
 
-def write_export_file(output_file, file_list, export_type, short_format=False, current_time=None, **kwargs):
+def write_export_file(output_file, file_list, export_type, short_format=False, current_time=None, stats=None, **kwargs):
     """
     Unified function to write export files with consistent formatting
     
     Args:
         output_file: Output file path
-        file_list: List of file records
+        file_list: List or iterator (e.g. a cursor) of file records
         export_type: Type of export for header (e.g., "high bitrate files", "RAW files")
         short_format: Whether to use short format (paths only)
         current_time: datetime object for deterministic output (default: now)
+        stats: fetch_export_stats totals of the records, required when file_list is an iterator.
+            Summary is written from them instead of being summed up row by row
         **kwargs: Additional parameters for specific export types
+    
+    Returns:
+        dict with files, total_size, video_count and image_count of written records
     """
+    accumulate = stats is None
+    file_count = len(file_list) if accumulate else stats['files']
+    
     if current_time is None:
         current_time = datetime.datetime.now()
         
-    with open(output_file, 'w', encoding='utf-8') as f:
+    with open(output_file, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as f:
+        files = 0
         total_size = 0
+        total_duration = 0
         video_count = 0
         image_count = 0
         
         if not short_format:
             # Header for full format
             f.write(f"# List of {export_type}\n")
-            f.write(f"# Found {len(file_list)} files\n")
+            f.write(f"# Found {file_count} files\n")
             f.write(f"# Created: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
             
             # Add specific criteria info
@@ -109,11 +226,16 @@ def write_export_file(output_file, file_list, export_type, short_format=False, c
                 f.write("# Format: file_path | type | size | duration | bitrate | resolution | codec | mtime\n")
             else:
                 f.write("# Format: file_path | type | size | duration | bitrate | resolution | codec\n")
-            f.write("#" + "="*100 + "\n\n")
+            f.write(SEPARATOR_LINE + "\n")
         
-        for row in file_list:
+        # Rows are joined into chunks, one write per EXPORT_CHUNK_ROWS rows
+        chunk = []
+        write = chunk.append
+        include_potential_dates = kwargs.get('include_potential_dates')
+        fmt_size, fmt_duration, fmt_bitrate = format_file_size, format_duration, format_bitrate
+        for files, row in enumerate(file_list, 1):
             # Handle different record formats
-            if len(row) >= 10 and kwargs.get('include_potential_dates'):
+            if len(row) >= 10 and include_potential_dates:
                 # Enhanced format with potential creation dates (path and mtime)
                 file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name, path_date, mtime_date = row[:10]
             elif len(row) >= 8:  # Full record format
@@ -126,309 +248,328 @@ def write_export_file(output_file, file_list, export_type, short_format=False, c
             else:
                 # Minimal format - extract what we can
                 file_path = row[0]
-                file_name = os.path.basename(file_path)
+                file_name = file_path.rpartition('/')[2]
                 file_size = row[2] if len(row) > 2 else None
                 media_type = 'unknown'
                 duration = bit_rate = resolution = codec_name = None
                 path_date = mtime_date = None
             
-            total_size += file_size if file_size else 0
-            if media_type == 'video':
-                video_count += 1
-            elif media_type == 'image':
-                image_count += 1
+            if accumulate:
+                total_size += file_size if file_size else 0
+                total_duration += row[4] if len(row) > 4 and row[4] else 0
+                if media_type == 'video':
+                    video_count += 1
+                elif media_type == 'image':
+                    image_count += 1
             
             if short_format:
                 # Short format: only file paths
-                f.write(f"{file_path}\n")
+                write(f"{file_path}\n")
             else:
                 # Full format: file path with metadata
-                size_str = format_file_size(file_size)
-                duration_str = format_duration(duration) if duration else "N/A"
-                bitrate_str = format_bitrate(bit_rate) if bit_rate else "N/A"
+                size_str = fmt_size(file_size)
+                duration_str = fmt_duration(duration) if duration else "N/A"
+                bitrate_str = fmt_bitrate(bit_rate) if bit_rate else "N/A"
                 codec_str = codec_name if codec_name else "N/A"
                 resolution_str = resolution if resolution else "N/A"
                 
                 # For no-metadata files, add mtime info
-                if kwargs.get('include_potential_dates'):
+                if include_potential_dates:
                     # Get mtime for the file
                     mtime_str = "N/A"
                     try:
                         if os.path.exists(file_path):
-                            import time
                             mtime = os.path.getmtime(file_path)
                             mtime_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mtime))
                     except (OSError, ValueError) as e:
                         print(f"{Fore.YELLOW}Warning: Cannot get mtime for {file_path}: {e}{Style.RESET_ALL}")
                         mtime_str = "N/A"
                     
-                    f.write(f"# {media_type.upper()} | {size_str} | {duration_str} | {bitrate_str} | {resolution_str} | {codec_str} | {mtime_str}\n")
-                    f.write(f"{file_path}\n")
+                    write(f"# {media_type.upper()} | {size_str} | {duration_str} | {bitrate_str} | {resolution_str} | {codec_str} | {mtime_str}\n")
+                    write(f"{file_path}\n")
                     
                     # Add potential creation time suggestions
                     if path_date and mtime_date:
                         # Both options available - path has priority, mtime is commented
-                        f.write(f"# From path:\n")
-                        f.write(f"CREATION_TIME {path_date}\n")
-                        f.write(f"# From mtime:\n")
-                        f.write(f"# CREATION_TIME {mtime_date}\n")
+                        write(f"# From path:\n")
+                        write(f"CREATION_TIME {path_date}\n")
+                        write(f"# From mtime:\n")
+                        write(f"# CREATION_TIME {mtime_date}\n")
                     elif path_date:
                         # Only path option available - not commented
-                        f.write(f"# From path:\n")
-                        f.write(f"CREATION_TIME {path_date}\n")
+                        write(f"# From path:\n")
+                        write(f"CREATION_TIME {path_date}\n")
                     elif mtime_date:
                         # Only mtime option available - not commented
-                        f.write(f"# From mtime:\n")
-                        f.write(f"CREATION_TIME {mtime_date}\n")
+                        write(f"# From mtime:\n")
+                        write(f"CREATION_TIME {mtime_date}\n")
                     
-                    f.write("\n")
+                    write("\n")
                 else:
-                    f.write(f"# {media_type.upper()} | {size_str} | {duration_str} | {bitrate_str} | {resolution_str} | {codec_str}\n")
-                    f.write(f"{file_path}\n\n")
+                    write(f"# {media_type.upper()} | {size_str} | {duration_str} | {bitrate_str} | {resolution_str} | {codec_str}\n")
+                    write(f"{file_path}\n\n")
+            
+            if files % EXPORT_CHUNK_ROWS == 0:
+                f.write(''.join(chunk))
+                chunk.clear()
+        f.write(''.join(chunk))
+        
+        if not accumulate:
+            total_size, total_duration = stats['total_size'], stats['total_duration']
+            video_count, image_count = stats['video_count'], stats['image_count']
         
         if not short_format:
             # Summary statistics for full format
-            f.write("#" + "="*100 + "\n")
+            f.write(SEPARATOR_LINE)
             f.write(f"# SUMMARY:\n")
-            f.write(f"# Total files: {len(file_list)}")
+            f.write(f"# Total files: {files}")
             if video_count > 0 or image_count > 0:
                 f.write(f" (Videos: {video_count}, Images: {image_count})")
             f.write(f"\n# Total size: {format_file_size(total_size)}\n")
             
             # Add total duration for videos
-            total_duration = sum(row[4] if len(row) > 4 and row[4] else 0 for row in file_list)
             if total_duration > 0:
                 f.write(f"# Total duration: {format_duration(total_duration)}\n")
-
-def query_largest_files(db_path, limit=20):
-    """Shows the largest files"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
     
-    query = '''
-        SELECT 
-            file_path,
-            file_name,
-            file_size,
-            duration,
-            bit_rate,
-            width || 'x' || height as resolution,
-            codec_name,
-            is_corrupted
-        FROM media_files 
-        WHERE file_size IS NOT NULL
-        ORDER BY file_size DESC 
-        LIMIT ?
-    '''
-    
-    cursor.execute(query, (limit,))
-    results = cursor.fetchall()
+    return {
+        'files': files,
+        'total_size': total_size,
+        'video_count': video_count,
+        'image_count': image_count,
+    }
+
+# Aggregates for export summaries, in EXPORT_STATS_KEYS order
+EXPORT_STATS_SQL = '''
+    COUNT(*),
+    COALESCE(SUM(file_size), 0),
+    COALESCE(SUM(duration), 0),
+    COUNT(CASE WHEN media_type = 'video' THEN 1 END),
+    COUNT(CASE WHEN media_type = 'image' THEN 1 END)
+'''
+EXPORT_STATS_KEYS = ('files', 'total_size', 'total_duration', 'video_count', 'image_count')
+
+def fetch_export_stats(cursor, from_where, params=()):
+    """Returns EXPORT_STATS_SQL aggregates of rows in from_where ("FROM ... WHERE ...") as dict"""
+    cursor.execute(f"SELECT {EXPORT_STATS_SQL} {from_where}", params)
+    return dict(zip(EXPORT_STATS_KEYS, cursor.fetchone()))
+
+def write_path_list(output_file, cursor):
+    """Writes short format export (paths only) from a cursor selecting file_path, returns number of paths"""
+    count = 0
+    with open(output_file, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as f:
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            f.write(''.join([f"{row[0]}\n" for row in rows]))
+            count += len(rows)
+    return count
+
+def add_example(found, key, row, limit=2):
+    """Counts row under key in found ({key: [count, examples]}), keeping first limit rows as examples"""
+    entry = found.get(key)
+    if entry is None:
+        entry = found[key] = [0, []]
+    entry[0] += 1
+    if len(entry[1]) < limit:
+        entry[1].append(row)
+
+# Columns of the top-N file tables: file_path, file_name, file_size, duration,
+# bit_rate, resolution, codec_name, is_corrupted
+TOP_FILES_QUERY = '''
+    SELECT 
+        file_path,
+        file_name,
+        file_size,
+        duration,
+        bit_rate,
+        width || 'x' || height as resolution,
+        codec_name,
+        is_corrupted
+    FROM media_files 
+    WHERE {where}
+    ORDER BY {order_by} DESC 
+    LIMIT ?
+'''
+
+# Table cells as (header, width, formatter, color), color is None for plain cells
+SIZE_COLUMN = ('Size', 10, lambda row: format_file_size(row[2]), None)
+DURATION_COLUMN = ('Duration', 8, lambda row: format_duration(row[3]), None)
+BITRATE_COLUMN = ('Bitrate', 12, lambda row: format_bitrate(row[4]), None)
+RESOLUTION_COLUMN = ('Resolution', 10, lambda row: row[5] if row[5] else "N/A", None)
+CODEC_COLUMN = ('Codec', 8, lambda row: row[6][:7] if row[6] else "N/A", None)
+STATUS_COLUMN = ('Status', 6, lambda row: "❌BAD" if row[7] else "✅OK",
+                 lambda row: Fore.RED if row[7] else Fore.GREEN)
+
+def fetch_top_files(db_path, where, order_by, params):
+    """Returns top files by order_by column as TOP_FILES_QUERY rows"""
+    cursor = _get_conn(db_path).cursor()
+    cursor.execute(TOP_FILES_QUERY.format(where=where, order_by=order_by), params)
+    return cursor.fetchall()
+
+def print_top_files(title, results, columns):
+    """
+    Prints a table of top files using the given cell columns
     
-    print(f"\n{Fore.CYAN}🗂️  {limit} LARGEST FILES{Style.RESET_ALL}")
-    print("=" * 120)
+    The table is printed at once, every colored cell resets its own color.
+    """
+    # Bound once, not looked up on colorama for every cell
+    reset = Style.RESET_ALL
     
     # Table header
-    header = f"{'#':<3} {'Size':<10} {'Duration':<8} {'Bitrate':<12} {'Resolution':<10} {'Codec':<8} {'Status':<6} {'File'}"
-    print(f"{Fore.YELLOW}{header}{Style.RESET_ALL}")
-    print("-" * 120)
+    header = f"{'#':<3} " + " ".join(f"{name:<{width}}" for name, width, _, _ in columns) + f" {'File'}"
+    lines = [
+        f"\n{Fore.CYAN}{title}{reset}",
+        "=" * 120,
+        f"{Fore.YELLOW}{header}{reset}",
+        "-" * 120,
+    ]
     
     for i, row in enumerate(results, 1):
-        file_path, file_name, file_size, duration, bit_rate, resolution, codec_name, is_corrupted = row
-        
-        # Format data
-        size_str = format_file_size(file_size)
-        duration_str = format_duration(duration)
-        bitrate_str = format_bitrate(bit_rate)
-        codec_str = codec_name[:7] if codec_name else "N/A"
-        status_str = "❌BAD" if is_corrupted else "✅OK"
-        resolution_str = resolution if resolution else "N/A"
-        
-        # Color highlighting
-        status_color = Fore.RED if is_corrupted else Fore.GREEN
-        size_color = Fore.MAGENTA if file_size and file_size > 1_000_000_000 else Fore.BLUE  # > 1GB
-        
-        print(f"{i:<3} {size_color}{size_str:<10}{Style.RESET_ALL} {duration_str:<8} {bitrate_str:<12} "
-              f"{resolution_str:<10} {codec_str:<8} {status_color}{status_str:<6}{Style.RESET_ALL} {file_name}")
+        cells = []
+        for name, width, formatter, color in columns:
+            if color is None:
+                cells.append(f"{formatter(row):<{width}}")
+            else:
+                cells.append(f"{color(row)}{formatter(row):<{width}}{reset}")
+        lines.append(f"{i:<3} " + " ".join(cells) + f" {row[1]}")
     
-    conn.close()
+    print("\n".join(lines))
 
-def query_high_bitrate_files(db_path, min_bitrate_mbps=10, limit=20):
-    """Shows files with high bitrate"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    min_bitrate_bps = min_bitrate_mbps * 1_000_000  # Convert Mbps to bps
-    
-    query = '''
-        SELECT 
-            file_path,
-            file_name,
-            file_size,
-            duration,
-            bit_rate,
-            width || 'x' || height as resolution,
-            codec_name,
-            is_corrupted
-        FROM media_files 
-        WHERE bit_rate IS NOT NULL AND bit_rate >= ? AND is_corrupted = 0
-        ORDER BY bit_rate DESC 
-        LIMIT ?
-    '''
-    
-    cursor.execute(query, (min_bitrate_bps, limit))
-    results = cursor.fetchall()
-    
-    print(f"\n{Fore.CYAN}⚡ HIGH BITRATE FILES (≥{min_bitrate_mbps} Mbit/s){Style.RESET_ALL}")
-    print("=" * 120)
+# Top-N reports are (title, where, order_by, params, columns)
+
+def largest_files_report(limit=20):
+    """Report of the largest files"""
+    # Color highlighting for files > 1GB
+    size_column = SIZE_COLUMN[:3] + (lambda row: Fore.MAGENTA if row[2] and row[2] > 1_000_000_000 else Fore.BLUE,)
+    return (f"🗂️  {limit} LARGEST FILES", "file_size IS NOT NULL", "file_size", (limit,),
+            (size_column, DURATION_COLUMN, BITRATE_COLUMN, RESOLUTION_COLUMN, CODEC_COLUMN, STATUS_COLUMN))
+
+def high_bitrate_files_report(min_bitrate_mbps=10, limit=20):
+    """Report of files with high bitrate"""
+    min_bitrate_bps = min_bitrate_mbps * BPS_PER_MBPS
+    # Color highlighting for very high bitrate (> 50 Mbps)
+    bitrate_column = BITRATE_COLUMN[:3] + (lambda row: Fore.RED if row[4] and row[4] > 50_000_000 else Fore.MAGENTA,)
+    return (f"⚡ HIGH BITRATE FILES (≥{min_bitrate_mbps} Mbit/s)",
+            "bit_rate IS NOT NULL AND bit_rate >= ? AND is_corrupted = 0", "bit_rate", (min_bitrate_bps, limit),
+            (bitrate_column, SIZE_COLUMN, DURATION_COLUMN, RESOLUTION_COLUMN, CODEC_COLUMN))
+
+def longest_files_report(limit=20):
+    """Report of the longest files"""
+    # Color highlighting for very long files (> 1 hour)
+    duration_column = ('Duration', 10, DURATION_COLUMN[2], lambda row: Fore.RED if row[3] and row[3] > 3600 else Fore.CYAN)
+    return (f"⏱️  {limit} LONGEST FILES",
+            "duration IS NOT NULL AND duration > 0 AND is_corrupted = 0", "duration", (limit,),
+            (duration_column, SIZE_COLUMN, BITRATE_COLUMN, RESOLUTION_COLUMN, CODEC_COLUMN))
+
+def show_reports(db_path, reports):
+    """
+    Prints top-N reports in the given order
     
-    # Table header
-    header = f"{'#':<3} {'Bitrate':<12} {'Size':<10} {'Duration':<8} {'Resolution':<10} {'Codec':<8} {'File'}"
-    print(f"{Fore.YELLOW}{header}{Style.RESET_ALL}")
-    print("-" * 120)
+    Queries run concurrently, each thread with its own connection
+    (SQLite readers do not block each other in WAL mode).
+    """
+    if len(reports) == 1:
+        title, where, order_by, params, columns = reports[0]
+        print_top_files(title, fetch_top_files(db_path, where, order_by, params), columns)
+        return
     
-    for i, row in enumerate(results, 1):
-        file_path, file_name, file_size, duration, bit_rate, resolution, codec_name, is_corrupted = row
-        
-        # Format data
-        bitrate_str = format_bitrate(bit_rate)
-        size_str = format_file_size(file_size)
-        duration_str = format_duration(duration)
-        codec_str = codec_name[:7] if codec_name else "N/A"
-        
-        # Color highlighting for very high bitrate
-        bitrate_color = Fore.RED if bit_rate and bit_rate > 50_000_000 else Fore.MAGENTA  # > 50 Mbps
-        
-        resolution_str = resolution if resolution else "N/A"
-        
-        print(f"{i:<3} {bitrate_color}{bitrate_str:<12}{Style.RESET_ALL} {size_str:<10} {duration_str:<8} "
-              f"{resolution_str:<10} {codec_str:<8} {file_name}")
+    with ThreadPoolExecutor(max_workers=len(reports)) as executor:
+        futures = [executor.submit(fetch_top_files, db_path, where, order_by, params)
+                   for title, where, order_by, params, columns in reports]
     
-    conn.close()
+    for (title, where, order_by, params, columns), future in zip(reports, futures):
+        print_top_files(title, future.result(), columns)
+
+def query_largest_files(db_path, limit=20):
+    """Shows the largest files"""
+    show_reports(db_path, [largest_files_report(limit)])
+
+def query_high_bitrate_files(db_path, min_bitrate_mbps=10, limit=20):
+    """Shows files with high bitrate"""
+    show_reports(db_path, [high_bitrate_files_report(min_bitrate_mbps, limit)])
 
 def query_longest_files(db_path, limit=20):
     """Shows the longest files"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    query = '''
-        SELECT 
-            file_path,
-            file_name,
-            file_size,
-            duration,
-            bit_rate,
-            width || 'x' || height as resolution,
-            codec_name,
-            is_corrupted
-        FROM media_files 
-        WHERE duration IS NOT NULL AND duration > 0 AND is_corrupted = 0
-        ORDER BY duration DESC 
-        LIMIT ?
-    '''
-    
-    cursor.execute(query, (limit,))
-    results = cursor.fetchall()
-    
-    print(f"\n{Fore.CYAN}⏱️  {limit} LONGEST FILES{Style.RESET_ALL}")
-    print("=" * 120)
-    
-    # Table header
-    header = f"{'#':<3} {'Duration':<10} {'Size':<10} {'Bitrate':<12} {'Resolution':<10} {'Codec':<8} {'File'}"
-    print(f"{Fore.YELLOW}{header}{Style.RESET_ALL}")
-    print("-" * 120)
-    
-    for i, row in enumerate(results, 1):
-        file_path, file_name, file_size, duration, bit_rate, resolution, codec_name, is_corrupted = row
-        
-        # Format data
-        duration_str = format_duration(duration)
-        size_str = format_file_size(file_size)
-        bitrate_str = format_bitrate(bit_rate)
-        codec_str = codec_name[:7] if codec_name else "N/A"
-        
-        # Color highlighting for very long files
-        duration_color = Fore.RED if duration and duration > 3600 else Fore.CYAN  # > 1 hour
-        resolution_str = resolution if resolution else "N/A"
-        
-        print(f"{i:<3} {duration_color}{duration_str:<10}{Style.RESET_ALL} {size_str:<10} {bitrate_str:<12} "
-              f"{resolution_str:<10} {codec_str:<8} {file_name}")
-    
-    conn.close()
+    show_reports(db_path, [longest_files_report(limit)])
 
 def export_raw_files(db_path, output_file, short_format=False, current_time=None):
     """Exports RAW image files to text file"""
-    conn = sqlite3.connect(db_path)
+    conn = _get_conn(db_path)
     cursor = conn.cursor()
     
     # Build query to find RAW files using file extensions
     raw_extensions_tuple = tuple(RAW_EXTENSIONS)
     placeholders = ', '.join('?' * len(raw_extensions_tuple))
     
-    query = f'''
-        SELECT 
-            file_path,
-            file_name,
-            file_size,
-            media_type,
-            duration,
-            bit_rate,
-            width || 'x' || height as resolution,
-            codec_name
-        FROM media_files 
+    where = f'''
         WHERE is_corrupted = 0 
           AND media_type = 'image'
           AND LOWER(SUBSTR(file_path, -4)) IN ({placeholders})
-        ORDER BY file_path
     '''
+    params = [ext.lower() for ext in raw_extensions_tuple]
     
-    cursor.execute(query, [ext.lower() for ext in raw_extensions_tuple])
-    results = cursor.fetchall()
-    
-    if not results:
-        print(f"{Fore.YELLOW}No RAW files found{Style.RESET_ALL}")
-        conn.close()
-        return
-    
-    # Sort files by directory structure (subdirectories first, then lexicographically)
-    results = sort_files_by_directory_depth(results)
-    
-    # Use unified export function
-    write_export_file(output_file, results, "RAW image files", short_format, current_time)
-    
-    conn.close()
+    with read_transaction(conn):
+        # Summary first for the header, rows are then streamed from the cursor
+        stats = fetch_export_stats(cursor, f"FROM media_files {where}", params)
+        file_count, total_size = stats['files'], stats['total_size']
+        
+        if not file_count:
+            print(f"{Fore.YELLOW}No RAW files found{Style.RESET_ALL}")
+            return
+        
+        query = f'''
+            SELECT 
+                file_path,
+                file_name,
+                file_size,
+                media_type,
+                duration,
+                bit_rate,
+                width || 'x' || height as resolution,
+                codec_name
+            FROM media_files 
+            {where}
+            ORDER BY {directory_order_sql()}
+        '''
+        cursor.execute(query, params)
+        
+        # Group by extension for display, only counts and first examples are kept
+        extensions_found = {}
+        
+        def rows():
+            for row in cursor:
+                # RAW query guarantees an extension, take everything from the last '.'
+                file_path = row[0]
+                add_example(extensions_found, file_path[file_path.rfind('.'):].lower(), row)
+                yield row
+        
+        # Use unified export function
+        write_export_file(output_file, rows(), "RAW image files", short_format, current_time, stats=stats)
     
     # Output statistics to screen
     print(f"\n{Fore.GREEN}✅ RAW files list exported to: {output_file}{Style.RESET_ALL}")
-    print(f"RAW files found: {len(results)}")
+    print(f"RAW files found: {file_count}")
     print(f"Format: {'Short (paths only)' if short_format else 'Full (with metadata)'}")
-    print(f"Total size: {format_file_size(sum(row[2] for row in results if row[2]))}")
+    print(f"Total size: {format_file_size(total_size)}")
     
     # Show examples by extension
     print(f"\n{Fore.CYAN}Examples of RAW files found:{Style.RESET_ALL}")
     
-    # Group by extension for display
-    extensions_found = {}
-    for row in results:
-        file_path = row[0]
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext not in extensions_found:
-            extensions_found[ext] = []
-        extensions_found[ext].append(row)
-    
     # Show examples for each extension
-    for ext, files in sorted(extensions_found.items()):
-        print(f"  {Fore.BLUE}{ext.upper()} files:{Style.RESET_ALL} {len(files)} found")
-        for i, row in enumerate(files[:2]):
+    for ext, (count, files) in sorted(extensions_found.items()):
+        print(f"  {Fore.BLUE}{ext.upper()} files:{Style.RESET_ALL} {count} found")
+        for i, row in enumerate(files):
             file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name = row
             size_str = format_file_size(file_size)
             print(f"    {i+1}. {file_name} ({size_str}, {resolution})")
     
-    if len(results) > sum(len(files[:2]) for files in extensions_found.values()):
+    if file_count > sum(len(files) for _, files in extensions_found.values()):
         print(f"  ... and more files")
 
 def export_old_video_files(db_path, output_file, short_format=False, current_time=None):
     """Exports video files with outdated codecs or formats to text file"""
-    conn = sqlite3.connect(db_path)
+    conn = _get_conn(db_path)
     cursor = conn.cursor()
     
     # Build query to find videos with outdated codecs or formats
@@ -439,95 +580,89 @@ def export_old_video_files(db_path, output_file, short_format=False, current_tim
     codecs_placeholders = ', '.join('?' * len(outdated_codecs_tuple))
     formats_placeholders = ', '.join('?' * len(outdated_formats_tuple))
     
-    query = f'''
-        SELECT 
-            file_path,
-            file_name,
-            file_size,
-            media_type,
-            duration,
-            bit_rate,
-            width || 'x' || height as resolution,
-            codec_name,
-            format_name
-        FROM media_files 
+    where = f'''
         WHERE is_corrupted = 0 
           AND media_type = 'video'
           AND (
             codec_name IN ({codecs_placeholders})
             OR format_name IN ({formats_placeholders})
           )
-        ORDER BY file_size DESC
     '''
     
     # Combine parameters for both codec and format checks
     query_params = list(outdated_codecs_tuple) + list(outdated_formats_tuple)
     
-    cursor.execute(query, query_params)
-    results = cursor.fetchall()
-    
-    if not results:
-        print(f"{Fore.YELLOW}No video files with outdated codecs/formats found{Style.RESET_ALL}")
-        conn.close()
-        return
-    
-    # Sort files by directory structure (subdirectories first, then lexicographically)
-    results = sort_files_by_directory_depth(results)
-    
-    # Use unified export function (need to adjust for format_name field)
-    # Convert results to match expected format for write_export_file
-    converted_results = []
-    for row in results:
-        # Extract format_name and include it in the display
-        file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name, format_name = row
+    with read_transaction(conn):
+        # Summary first for the header, rows are then streamed from the cursor
+        stats = fetch_export_stats(cursor, f"FROM media_files {where}", query_params)
+        file_count, total_size = stats['files'], stats['total_size']
         
-        # Create a modified codec field that includes format info
-        codec_with_format = f"{codec_name or 'N/A'}"
-        if format_name and format_name in OUTDATED_FORMATS:
-            codec_with_format += f" (format: {format_name})"
+        if not file_count:
+            print(f"{Fore.YELLOW}No video files with outdated codecs/formats found{Style.RESET_ALL}")
+            return
         
-        # Convert back to 8-field format expected by write_export_file
-        converted_row = (file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_with_format)
-        converted_results.append(converted_row)
-    
-    write_export_file(output_file, converted_results, "video files with outdated codecs/formats", short_format, current_time)
-    
-    conn.close()
+        query = f'''
+            SELECT 
+                file_path,
+                file_name,
+                file_size,
+                media_type,
+                duration,
+                bit_rate,
+                width || 'x' || height as resolution,
+                codec_name,
+                format_name
+            FROM media_files 
+            {where}
+            ORDER BY {directory_order_sql()}
+        '''
+        cursor.execute(query, query_params)
+        
+        # Group by codec and format for display, only counts and first examples are kept
+        codecs_found = {}
+        formats_found = {}
+        
+        def converted_results():
+            # Convert results to match expected format for write_export_file
+            for row in cursor:
+                # Extract format_name and include it in the display
+                file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name, format_name = row
+                
+                # Group by codec
+                if codec_name and codec_name in OUTDATED_CODECS:
+                    add_example(codecs_found, codec_name, row)
+                
+                # Group by format 
+                if format_name and format_name in OUTDATED_FORMATS:
+                    add_example(formats_found, format_name, row)
+                
+                # Create a modified codec field that includes format info
+                codec_with_format = f"{codec_name or 'N/A'}"
+                if format_name and format_name in OUTDATED_FORMATS:
+                    codec_with_format += f" (format: {format_name})"
+                
+                # Convert back to 8-field format expected by write_export_file
+                yield (file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_with_format)
+        
+        # Use unified export function (need to adjust for format_name field)
+        write_export_file(output_file, converted_results(), "video files with outdated codecs/formats", short_format, current_time,
+                          stats=stats)
     
     # Output statistics to screen
     print(f"\n{Fore.GREEN}✅ Old video files list exported to: {output_file}{Style.RESET_ALL}")
-    print(f"Video files with outdated codecs/formats: {len(results)}")
+    print(f"Video files with outdated codecs/formats: {file_count}")
     print(f"Format: {'Short (paths only)' if short_format else 'Full (with metadata)'}")
-    print(f"Total size: {format_file_size(sum(row[2] for row in results if row[2]))}")
+    print(f"Total size: {format_file_size(total_size)}")
     
     # Show examples by codec/format type
     print(f"\n{Fore.CYAN}Examples of old video files found:{Style.RESET_ALL}")
     
-    # Group by codec and format for display
-    codecs_found = {}
-    formats_found = {}
-    
-    for row in results:
-        file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name, format_name = row
-        
-        # Group by codec
-        if codec_name and codec_name in OUTDATED_CODECS:
-            if codec_name not in codecs_found:
-                codecs_found[codec_name] = []
-            codecs_found[codec_name].append(row)
-        
-        # Group by format 
-        if format_name and format_name in OUTDATED_FORMATS:
-            if format_name not in formats_found:
-                formats_found[format_name] = []
-            formats_found[format_name].append(row)
-    
     # Show examples for each outdated codec
     if codecs_found:
         print(f"  {Fore.RED}Outdated Codecs:{Style.RESET_ALL}")
-        for codec, files in sorted(codecs_found.items()):
-            print(f"    {Fore.BLUE}{codec}:{Style.RESET_ALL} {len(files)} found")
-            for i, row in enumerate(files[:2]):
+        for codec, (count, files) in sorted(codecs_found.items()):
+            print(f"    {Fore.BLUE}{codec}:{Style.RESET_ALL} {count} found")
+            for i, row in enumerate(files):
                 file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name, format_name = row
                 size_str = format_file_size(file_size)
                 duration_str = format_duration(duration)
@@ -536,9 +671,9 @@ def export_old_video_files(db_path, output_file, short_format=False, current_tim
     # Show examples for each outdated format
     if formats_found:
         print(f"  {Fore.MAGENTA}Outdated Formats:{Style.RESET_ALL}")
-        for format_name, files in sorted(formats_found.items()):
-            print(f"    {Fore.BLUE}{format_name}:{Style.RESET_ALL} {len(files)} found")
-            for i, row in enumerate(files[:2]):
+        for format_name, (count, files) in sorted(formats_found.items()):
+            print(f"    {Fore.BLUE}{format_name}:{Style.RESET_ALL} {count} found")
+            for i, row in enumerate(files):
                 file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name, format_name = row
                 size_str = format_file_size(file_size)
                 duration_str = format_duration(duration)
@@ -546,72 +681,69 @@ def export_old_video_files(db_path, output_file, short_format=False, current_tim
                 print(f"      {i+1}. {file_name} ({size_str}, {duration_str}, {resolution}, codec: {codec_str})")
     
     # Show total counts
-    total_codec_files = sum(len(files) for files in codecs_found.values())
-    total_format_files = sum(len(files) for files in formats_found.values())
+    total_codec_files = sum(count for count, _ in codecs_found.values())
+    total_format_files = sum(count for count, _ in formats_found.values())
     
     if total_codec_files > 0 or total_format_files > 0:
         print(f"  Summary: {total_codec_files} files with outdated codecs, {total_format_files} files with outdated formats")
         # Note: some files might have both outdated codec AND format, so total may be less than sum
-        if total_codec_files + total_format_files > len(results):
+        if total_codec_files + total_format_files > file_count:
             print(f"  (Some files have both outdated codec and format)")
 
 def export_corrupted_files(db_path, output_file, short_format=False, current_time=None):
     """Exports corrupted files (is_corrupted = 1) to text file"""
-    conn = sqlite3.connect(db_path)
+    conn = _get_conn(db_path)
     cursor = conn.cursor()
     
-    query = '''
-        SELECT 
-            file_path,
-            file_name,
-            file_size,
-            media_type,
-            duration,
-            bit_rate,
-            width || 'x' || height as resolution,
-            codec_name
-        FROM media_files 
-        WHERE is_corrupted = 1
-        ORDER BY file_path
-    '''
-    
-    cursor.execute(query)
-    results = cursor.fetchall()
-    
-    if not results:
-        print(f"{Fore.YELLOW}No corrupted files found{Style.RESET_ALL}")
-        conn.close()
-        return
-    
-    # Sort files by directory structure (subdirectories first, then lexicographically)
-    results = sort_files_by_directory_depth(results)
-    
-    # Use unified export function
-    write_export_file(output_file, results, "corrupted files", short_format, current_time)
-    
-    conn.close()
+    with read_transaction(conn):
+        # Summary first for the header, rows are then streamed from the cursor
+        stats = fetch_export_stats(cursor, "FROM media_files WHERE is_corrupted = 1")
+        file_count, total_size = stats['files'], stats['total_size']
+        
+        if not file_count:
+            print(f"{Fore.YELLOW}No corrupted files found{Style.RESET_ALL}")
+            return
+        
+        query = f'''
+            SELECT 
+                file_path,
+                file_name,
+                file_size,
+                media_type,
+                duration,
+                bit_rate,
+                width || 'x' || height as resolution,
+                codec_name
+            FROM media_files 
+            WHERE is_corrupted = 1
+            ORDER BY {directory_order_sql()}
+        '''
+        cursor.execute(query)
+        
+        # Group by media type for display, only counts and first examples are kept
+        media_types = {}
+        
+        def rows():
+            for row in cursor:
+                add_example(media_types, row[3], row)
+                yield row
+        
+        # Use unified export function
+        write_export_file(output_file, rows(), "corrupted files", short_format, current_time, stats=stats)
     
     # Output statistics to screen
     print(f"\n{Fore.GREEN}✅ Corrupted files list exported to: {output_file}{Style.RESET_ALL}")
-    print(f"Corrupted files found: {len(results)}")
+    print(f"Corrupted files found: {file_count}")
     print(f"Format: {'Short (paths only)' if short_format else 'Full (with metadata)'}")
-    print(f"Total size: {format_file_size(sum(row[2] for row in results if row[2]))}")
+    print(f"Total size: {format_file_size(total_size)}")
     
     # Show examples by media type
     print(f"\n{Fore.CYAN}Examples of corrupted files found:{Style.RESET_ALL}")
     
-    # Group by media type for display
-    media_types = {}
-    for row in results:
-        file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name = row
-        if media_type not in media_types:
-            media_types[media_type] = []
-        media_types[media_type].append(row)
-    
     # Show examples for each media type
-    for media_type, files in sorted(media_types.items()):
-        print(f"  {Fore.BLUE}{media_type.upper()} files:{Style.RESET_ALL} {len(files)} found")
-        for i, row in enumerate(files[:2]):
+    for media_type, (count, files) in sorted(media_types.items()):
+        print(f"  {Fore.BLUE}{media_type.upper()} files:{Style.RESET_ALL} {count} found")
+        for i, row in enumerate(files):
             file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name = row
             size_str = format_file_size(file_size)
             if media_type == 'video':
@@ -620,287 +752,303 @@ def export_corrupted_files(db_path, output_file, short_format=False, current_tim
             else:
                 print(f"    {i+1}. {file_name} ({size_str}, {resolution})")
     
-    if len(results) > sum(len(files[:2]) for files in media_types.values()):
+    if file_count > sum(len(files) for _, files in media_types.values()):
         print(f"  ... and more files")
 
 def export_files_list(db_path, output_file, min_bitrate_mbps=15, min_size_mb=50, short_format=False, current_time=None):
     """Exports list of files by given criteria to text file"""
-    conn = sqlite3.connect(db_path)
+    conn = _get_conn(db_path)
     cursor = conn.cursor()
     
-    min_bitrate_bps = min_bitrate_mbps * 1_000_000  # Convert Mbps to bps
-    min_size_bytes = min_size_mb * 1024 * 1024     # Convert MB to bytes
-    
-    query = '''
-        SELECT 
-            file_path,
-            file_name,
-            file_size,
-            bit_rate,
-            duration,
-            width || 'x' || height as resolution,
-            codec_name
-        FROM media_files 
+    min_bitrate_bps = min_bitrate_mbps * BPS_PER_MBPS
+    min_size_bytes = min_size_mb * BYTES_PER_MB
+    
+    where = '''
         WHERE bit_rate IS NOT NULL 
           AND bit_rate >= ? 
           AND file_size IS NOT NULL 
           AND file_size >= ?
           AND is_corrupted = 0
-        ORDER BY file_path ASC
     '''
+    params = (min_bitrate_bps, min_size_bytes)
     
-    cursor.execute(query, (min_bitrate_bps, min_size_bytes))
-    results = cursor.fetchall()
-    
-    if not results:
-        print(f"{Fore.YELLOW}No files found with bitrate ≥{min_bitrate_mbps} Mbit/s and size ≥{min_size_mb} MB{Style.RESET_ALL}")
-        conn.close()
-        return
-    
-    # Sort files by directory structure (subdirectories first, then lexicographically)
-    results = sort_files_by_directory_depth(results)
-    
-    # Use unified export function
-    write_export_file(output_file, results, f"video files with bitrate ≥{min_bitrate_mbps} Mbit/s and size ≥{min_size_mb} MB", 
-                      short_format, current_time, min_bitrate=min_bitrate_mbps, min_size=min_size_mb)
-    
-    conn.close()
+    with read_transaction(conn):
+        # Summary first for the header, rows are then streamed from the cursor
+        stats = fetch_export_stats(cursor, f"FROM media_files {where}", params)
+        file_count, total_size = stats['files'], stats['total_size']
+        
+        if not file_count:
+            print(f"{Fore.YELLOW}No files found with bitrate ≥{min_bitrate_mbps} Mbit/s and size ≥{min_size_mb} MB{Style.RESET_ALL}")
+            return
+        
+        query = f'''
+            SELECT 
+                file_path,
+                file_name,
+                file_size,
+                bit_rate,
+                duration,
+                width || 'x' || height as resolution,
+                codec_name
+            FROM media_files 
+            {where}
+            ORDER BY {directory_order_sql()}
+        '''
+        
+        if short_format:
+            # Paths only, other columns are needed just for the examples
+            cursor.execute(f"SELECT file_path FROM media_files {where} ORDER BY {directory_order_sql()}", params)
+            write_path_list(output_file, cursor)
+            cursor.execute(f"{query} LIMIT 5", params)
+            examples = cursor.fetchall()
+        else:
+            cursor.execute(query, params)
+            examples = []
+            
+            def rows():
+                for row in cursor:
+                    if len(examples) < 5:
+                        examples.append(row)
+                    yield row
+            
+            # Use unified export function, rows without media_type are written (and counted) as videos
+            write_export_file(output_file, rows(), f"video files with bitrate ≥{min_bitrate_mbps} Mbit/s and size ≥{min_size_mb} MB", 
+                              short_format, current_time, stats=dict(stats, video_count=file_count, image_count=0),
+                              min_bitrate=min_bitrate_mbps, min_size=min_size_mb)
     
     # Output statistics to screen
     print(f"\n{Fore.GREEN}✅ File list exported to: {output_file}{Style.RESET_ALL}")
-    print(f"Files found: {len(results)}")
+    print(f"Files found: {file_count}")
     print(f"Criteria: bitrate ≥{min_bitrate_mbps} Mbit/s, size ≥{min_size_mb} MB")
     print(f"Format: {'Short (paths only)' if short_format else 'Full (with metadata)'}")
-    print(f"Total size: {format_file_size(sum(row[2] for row in results if row[2]))}")
+    print(f"Total size: {format_file_size(total_size)}")
     
     # Show examples
     print(f"\n{Fore.CYAN}Examples of found files:{Style.RESET_ALL}")
-    for i, row in enumerate(results[:5]):
+    for i, row in enumerate(examples):
         file_path, file_name, file_size, bit_rate, duration, resolution, codec_name = row
         size_str = format_file_size(file_size)
         bitrate_str = format_bitrate(bit_rate)
         print(f"  {i+1}. {file_name} ({size_str}, {bitrate_str})")
     
-    if len(results) > 5:
-        print(f"  ... and {len(results) - 5} more files")
+    if file_count > 5:
+        print(f"  ... and {file_count - 5} more files")
 
 def export_files_with_suffix(db_path, output_file, suffix, short_format=False, current_time=None):
     """Exports files with given suffix that have corresponding original files without suffix in same directory"""
     
-    conn = sqlite3.connect(db_path)
+    conn = _get_conn(db_path)
     cursor = conn.cursor()
     
-    # Get all files from database
-    query = '''
-        SELECT 
-            file_path,
-            file_name,
-            file_size,
-            media_type,
-            duration,
-            bit_rate,
-            width || 'x' || height as resolution,
-            codec_name
-        FROM media_files 
-        WHERE is_corrupted = 0
-        ORDER BY file_path
+    # Files whose name without extension ends with suffix and whose original
+    # (name without suffix, any extension) is in the same directory.
+    # Names not longer than the suffix are rejected by length before comparing text.
+    if ensure_path_columns(conn):
+        source = "media_files"
+    else:
+        # Read-only database without path columns, compute them on the fly
+        source = f"(SELECT *, {DIR_PATH_SQL} AS dir_path, {BASE_NO_EXT_SQL} AS base_no_ext FROM media_files)"
+    
+    from_where = f'''
+        FROM {source} c
+        WHERE c.is_corrupted = 0
+          AND length(c.base_no_ext) > length(:suffix)
+          AND substr(c.base_no_ext, -length(:suffix)) = :suffix
+          AND EXISTS (
+              SELECT 1 FROM {source} o
+              WHERE o.dir_path = c.dir_path
+                AND o.base_no_ext = substr(c.base_no_ext, 1, length(c.base_no_ext) - length(:suffix))
+                AND o.is_corrupted = 0
+          )
     '''
+    params = {'suffix': suffix}
     
-    cursor.execute(query)
-    all_files = cursor.fetchall()
-    
-    # Build directory index for fast lookup
-    # Structure: {directory: {base_name_without_ext: [file_records]}}
-    dir_index = {}
-    
-    for file_record in all_files:
-        file_path = file_record[0]
-        dir_name = os.path.dirname(file_path)
-        file_name = os.path.basename(file_path)
-        name_without_ext = os.path.splitext(file_name)[0]
-        
-        if dir_name not in dir_index:
-            dir_index[dir_name] = {}
-        
-        if name_without_ext not in dir_index[dir_name]:
-            dir_index[dir_name][name_without_ext] = []
+    with read_transaction(conn):
+        # Summary first for the header, rows are then streamed from the cursor
+        stats = fetch_export_stats(cursor, from_where, params)
+        file_count, total_size, video_count = stats['files'], stats['total_size'], stats['video_count']
+        image_count = file_count - video_count  # everything that is not a video
         
-        dir_index[dir_name][name_without_ext].append(file_record)
-    
-    # Find files with suffix that have corresponding originals
-    suffix_files = []
-    
-    for dir_name, files_by_base in dir_index.items():
-        for base_name, file_records in files_by_base.items():
-            # Check if this base name ends with the suffix
-            if base_name.endswith(suffix):
-                # Get base name without suffix
-                original_base = base_name[:-len(suffix)]
-                
-                # Check if original exists in same directory
-                if original_base in files_by_base:
-                    # Found files with suffix that have corresponding originals
-                    for file_record in file_records:
-                        suffix_files.append((file_record, original_base))
-    
-    if not suffix_files:
-        print(f"{Fore.YELLOW}No files with suffix '{suffix}' found that have corresponding originals{Style.RESET_ALL}")
-        conn.close()
-        return
-    
-    # Sort files using common sorting function
-    suffix_files = sort_files_by_directory_depth(suffix_files)
-    
-    # Write to file
-    if current_time is None:
-        current_time = datetime.datetime.now()
+        if not file_count:
+            print(f"{Fore.YELLOW}No files with suffix '{suffix}' found that have corresponding originals{Style.RESET_ALL}")
+            return
         
-    with open(output_file, 'w', encoding='utf-8') as f:
-        total_size = 0
-        video_count = 0
-        image_count = 0
+        query = f'''
+            SELECT 
+                c.file_path,
+                c.file_name,
+                c.file_size,
+                c.media_type,
+                c.duration,
+                c.bit_rate,
+                c.width || 'x' || c.height as resolution,
+                c.codec_name,
+                substr(c.base_no_ext, 1, length(c.base_no_ext) - length(:suffix)) as original_base
+            {from_where}
+            ORDER BY {directory_order_sql('c')}
+        '''
         
-        if not short_format:
-            # Header for full format
-            f.write(f"# List of files with suffix '{suffix}' that have corresponding originals\n")
-            f.write(f"# Found {len(suffix_files)} files\n")
-            f.write(f"# Created: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("#\n")
-            f.write("# Format: file_path | type | size | duration | bitrate | resolution | codec | original_base\n")
-            f.write("#" + "="*100 + "\n\n")
-        
-        for file_record, original_base in suffix_files:
-            file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name = file_record
+        if short_format:
+            # Paths only, other columns are needed just for the examples
+            cursor.execute(f"SELECT c.file_path {from_where} ORDER BY {directory_order_sql('c')}", params)
+            write_path_list(output_file, cursor)
+            cursor.execute(f"{query} LIMIT 5", params)
+            examples = cursor.fetchall()
+        else:
+            cursor.execute(query, params)
+            examples = []
             
-            total_size += file_size if file_size else 0
-            if media_type == 'video':
-                video_count += 1
-            else:
-                image_count += 1
+            # Write to file
+            if current_time is None:
+                current_time = datetime.datetime.now()
             
-            if short_format:
-                # Short format: only file paths
-                f.write(f"{file_path}\n")
-            else:
-                # Full format: file path with metadata and original info
-                size_str = format_file_size(file_size)
-                duration_str = format_duration(duration) if duration else "N/A"
-                bitrate_str = format_bitrate(bit_rate)
-                codec_str = codec_name if codec_name else "N/A"
+            with open(output_file, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as f:
+                # Header for full format
+                f.write(f"# List of files with suffix '{suffix}' that have corresponding originals\n")
+                f.write(f"# Found {file_count} files\n")
+                f.write(f"# Created: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write("#\n")
+                f.write("# Format: file_path | type | size | duration | bitrate | resolution | codec | original_base\n")
+                f.write(SEPARATOR_LINE + "\n")
                 
-                f.write(f"# {media_type.upper()} | {size_str} | {duration_str} | {bitrate_str} | {resolution} | {codec_str} | original: {original_base}\n")
-                f.write(f"{file_path}\n\n")
-        
-        if not short_format:
-            # Summary statistics for full format
-            f.write("#" + "="*100 + "\n")
-            f.write(f"# SUMMARY:\n")
-            f.write(f"# Total files with suffix '{suffix}': {len(suffix_files)} (Videos: {video_count}, Images: {image_count})\n")
-            f.write(f"# Total size: {format_file_size(total_size)}\n")
-    
-    conn.close()
+                chunk = []
+                write = chunk.append
+                fmt_size, fmt_duration, fmt_bitrate = format_file_size, format_duration, format_bitrate
+                for files, row in enumerate(cursor, 1):
+                    file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name, original_base = row
+                    if len(examples) < 5:
+                        examples.append(row)
+                    
+                    # Full format: file path with metadata and original info
+                    size_str = fmt_size(file_size)
+                    duration_str = fmt_duration(duration) if duration else "N/A"
+                    bitrate_str = fmt_bitrate(bit_rate)
+                    codec_str = codec_name if codec_name else "N/A"
+                    
+                    write(f"# {media_type.upper()} | {size_str} | {duration_str} | {bitrate_str} | {resolution} | {codec_str} | original: {original_base}\n")
+                    write(f"{file_path}\n\n")
+                    
+                    if files % EXPORT_CHUNK_ROWS == 0:
+                        f.write(''.join(chunk))
+                        chunk.clear()
+                f.write(''.join(chunk))
+                
+                # Summary statistics for full format
+                f.write(SEPARATOR_LINE)
+                f.write(f"# SUMMARY:\n")
+                f.write(f"# Total files with suffix '{suffix}': {file_count} (Videos: {video_count}, Images: {image_count})\n")
+                f.write(f"# Total size: {format_file_size(total_size)}\n")
     
     # Output statistics to screen
     print(f"\n{Fore.GREEN}✅ Files with suffix '{suffix}' exported to: {output_file}{Style.RESET_ALL}")
-    print(f"Files with suffix that have originals: {len(suffix_files)} (Videos: {video_count}, Images: {image_count})")
+    print(f"Files with suffix that have originals: {file_count} (Videos: {video_count}, Images: {image_count})")
     print(f"Format: {'Short (paths only)' if short_format else 'Full (with metadata)'}")
     print(f"Total size: {format_file_size(total_size)}")
     
     # Show examples
     print(f"\n{Fore.CYAN}Examples of files with suffix '{suffix}':{Style.RESET_ALL}")
     
-    for i, (file_record, original_base) in enumerate(suffix_files[:5]):
-        file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name = file_record
+    for i, row in enumerate(examples):
+        file_path, file_name, file_size, media_type, duration, bit_rate, resolution, codec_name, original_base = row
         size_str = format_file_size(file_size)
         dir_name = os.path.dirname(file_path)
         
         print(f"  {i+1}. {file_name} ({size_str}) -> original: {original_base}.*")
         print(f"      Directory: {dir_name}")
     
-    if len(suffix_files) > 5:
-        print(f"  ... and {len(suffix_files) - 5} more files")
+    if file_count > 5:
+        print(f"  ... and {file_count - 5} more files")
 
 def export_no_metadata_files(db_path, output_file, short_format=False, current_time=None):
     """Exports files without creation_date metadata to text file"""
-    import os
-    from datetime import datetime
-    from lib.utils import parse_datetime_from_path
-    
-    conn = sqlite3.connect(db_path)
+    conn = _get_conn(db_path)
     cursor = conn.cursor()
     
-    query = '''
-        SELECT 
-            file_path,
-            file_name,
-            file_size,
-            media_type,
-            duration,
-            bit_rate,
-            width || 'x' || height as resolution,
-            codec_name
-        FROM media_files 
-        WHERE creation_date IS NULL AND is_corrupted = 0
-        ORDER BY media_type, file_size DESC
-    '''
-    
-    cursor.execute(query)
-    results = cursor.fetchall()
-    
-    if not results:
-        print(f"{Fore.YELLOW}All files have creation_date metadata{Style.RESET_ALL}")
-        conn.close()
-        return
+    where = "WHERE creation_date IS NULL AND is_corrupted = 0"
     
-    # Sort files by directory structure (subdirectories first, then lexicographically)
-    results = sort_files_by_directory_depth(results)
-    
-    # Enhance results with potential creation time information
-    enhanced_results = []
-    for row in results:
-        file_path = row[0]
-        path_creation_time = None
-        mtime_creation_time = None
+    with read_transaction(conn):
+        # Summary first for the header, rows are then streamed from the cursor
+        stats = fetch_export_stats(cursor, f"FROM media_files {where}")
+        file_count, total_size = stats['files'], stats['total_size']
+        video_count, image_count = stats['video_count'], stats['image_count']
         
-        # Try parsing from path
-        parsed_date = parse_datetime_from_path(file_path)
-        if parsed_date:
-            path_creation_time = parsed_date.strftime('%Y-%m-%d %H:%M:%S')
+        if not file_count:
+            print(f"{Fore.YELLOW}All files have creation_date metadata{Style.RESET_ALL}")
+            return
         
-        # Always try mtime as alternative option
-        try:
-            if os.path.exists(file_path):
-                mtime = os.path.getmtime(file_path)
-                mtime_date = datetime.fromtimestamp(mtime)
-                mtime_creation_time = mtime_date.strftime('%Y-%m-%d %H:%M:%S')
-        except (OSError, ValueError) as e:
-            print(f"{Fore.YELLOW}Warning: Cannot get mtime for {file_path}: {e}{Style.RESET_ALL}")
+        columns = '''
+                file_path,
+                file_name,
+                file_size,
+                media_type,
+                duration,
+                bit_rate,
+                width || 'x' || height as resolution,
+                codec_name
+        '''
+        order_by = directory_order_sql()
+        
+        def add_potential_dates(row):
+            """Adds potential creation times (from path and from mtime) to the row"""
+            file_path = row[0]
+            path_creation_time = None
             mtime_creation_time = None
+            
+            # Try parsing from path
+            parsed_date = parse_datetime_from_path(file_path)
+            if parsed_date:
+                path_creation_time = parsed_date.strftime('%Y-%m-%d %H:%M:%S')
+            
+            # Always try mtime as alternative option
+            try:
+                if os.path.exists(file_path):
+                    mtime = os.path.getmtime(file_path)
+                    mtime_date = datetime.datetime.fromtimestamp(mtime)
+                    mtime_creation_time = mtime_date.strftime('%Y-%m-%d %H:%M:%S')
+            except (OSError, ValueError) as e:
+                print(f"{Fore.YELLOW}Warning: Cannot get mtime for {file_path}: {e}{Style.RESET_ALL}")
+                mtime_creation_time = None
+            
+            return row + (path_creation_time, mtime_creation_time)
         
-        # Add both potential creation times to the row
-        enhanced_row = row + (path_creation_time, mtime_creation_time)
-        enhanced_results.append(enhanced_row)
-    
-    # Use unified export function with enhanced data
-    write_export_file(output_file, enhanced_results, "files without creation_date metadata", 
-                     short_format, current_time, include_potential_dates=True)
-    
-    conn.close()
+        if short_format:
+            # Paths only, potential dates are needed just for the examples
+            cursor.execute(f"SELECT file_path FROM media_files {where} ORDER BY {order_by}")
+            write_path_list(output_file, cursor)
+            
+            examples_query = f"SELECT {columns} FROM media_files {where} AND media_type = ? ORDER BY {order_by} LIMIT 3"
+            image_examples = [add_potential_dates(row) for row in cursor.execute(examples_query, ('image',)).fetchall()]
+            video_examples = [add_potential_dates(row) for row in cursor.execute(examples_query, ('video',)).fetchall()]
+        else:
+            cursor.execute(f"SELECT {columns} FROM media_files {where} ORDER BY {order_by}")
+            
+            image_examples = []
+            video_examples = []
+            
+            # Enhance results with potential creation time information
+            def enhanced_results():
+                for row in cursor:
+                    enhanced_row = add_potential_dates(row)
+                    if enhanced_row[3] == 'image' and len(image_examples) < 3:
+                        image_examples.append(enhanced_row)
+                    elif enhanced_row[3] == 'video' and len(video_examples) < 3:
+                        video_examples.append(enhanced_row)
+                    yield enhanced_row
+            
+            # Use unified export function with enhanced data
+            write_export_file(output_file, enhanced_results(), "files without creation_date metadata", 
+                              short_format, current_time, stats=stats, include_potential_dates=True)
     
     # Output statistics to screen with potential creation time info
-    image_count = len([row for row in enhanced_results if row[3] == 'image'])
-    video_count = len([row for row in enhanced_results if row[3] == 'video'])
-    
     print(f"\n{Fore.GREEN}✅ No-metadata files list exported to: {output_file}{Style.RESET_ALL}")
-    print(f"Files without creation_date: {len(enhanced_results)} (Images: {image_count}, Videos: {video_count})")
+    print(f"Files without creation_date: {file_count} (Images: {image_count}, Videos: {video_count})")
     print(f"Format: {'Short (paths only)' if short_format else 'Full (with metadata)'}")
-    print(f"Total size: {format_file_size(sum(row[2] for row in enhanced_results if row[2]))}")
+    print(f"Total size: {format_file_size(total_size)}")
     
     # Show examples by type with potential creation time
     print(f"\n{Fore.CYAN}Examples of files without metadata:{Style.RESET_ALL}")
     
     # Show images first
-    image_examples = [row for row in enhanced_results if row[3] == 'image'][:3]
     if image_examples:
         print(f"  {Fore.BLUE}Images:{Style.RESET_ALL}")
         for i, row in enumerate(image_examples):
@@ -922,7 +1070,6 @@ def export_no_metadata_files(db_path, output_file, short_format=False, current_t
             print(f"    {i+1}. {file_name} ({size_str}, {resolution}{creation_info})")
     
     # Show videos
-    video_examples = [row for row in enhanced_results if row[3] == 'video'][:3]
     if video_examples:
         print(f"  {Fore.MAGENTA}Videos:{Style.RESET_ALL}")
         for i, row in enumerate(video_examples):
@@ -945,11 +1092,29 @@ def export_no_metadata_files(db_path, output_file, short_format=False, current_t
             
             print(f"    {i+1}. {file_name} ({size_str}, {duration_str}, {codec_str}{creation_info})")
     
-    remaining = len(enhanced_results) - len(image_examples) - len(video_examples)
+    remaining = file_count - len(image_examples) - len(video_examples)
     if remaining > 0:
         print(f"  ... and {remaining} more files")
 
-def determine_original_and_copies(files, duplicate_patterns=None):
+def build_pattern_matcher(patterns):
+    """
+    Returns a function telling whether a path contains any of the patterns.
+    Uses an Aho-Corasick automaton (one pass per path) when pyahocorasick is
+    available and there are enough patterns to pay for it.
+    """
+    if not patterns:
+        return lambda path: False
+    
+    if ahocorasick is None or len(patterns) <= 2 or not all(patterns):
+        return lambda path: any(pattern in path for pattern in patterns)
+    
+    automaton = ahocorasick.Automaton()
+    for pattern in patterns:
+        automaton.add_word(pattern, pattern)
+    automaton.make_automaton()
+    return lambda path: next(automaton.iter(path), None) is not None
+
+def determine_original_and_copies(files, duplicate_patterns=None, matches_pattern=None):
     """
     Determines which file is the original and which are copies based on the algorithm:
     1. Sort files lexicographically by full path
@@ -958,6 +1123,9 @@ def determine_original_and_copies(files, duplicate_patterns=None):
        2.2. If all files are processed and still >1 potential ORIGINAL, 
             keep the one with smallest lexicographic order as ORIGINAL
     
+    matches_pattern is a prebuilt build_pattern_matcher(duplicate_patterns),
+    pass it when classifying many groups with the same patterns.
+    
     Returns: (original_file, copy_files)
     """
     if not files:
@@ -973,18 +1141,12 @@ def determine_original_and_copies(files, duplicate_patterns=None):
     potential_originals = []
     copies = []
     
+    if matches_pattern is None:
+        matches_pattern = build_pattern_matcher(duplicate_patterns)
+    
     for file_data in sorted_files:
-        file_path = file_data[0]
-        is_copy = False
-        
         # Check if file matches any duplicate pattern
-        if duplicate_patterns:
-            for pattern in duplicate_patterns:
-                if pattern in file_path:
-                    is_copy = True
-                    break
-        
-        if is_copy:
+        if matches_pattern(file_data[0]):
             copies.append(file_data)
         else:
             potential_originals.append(file_data)
@@ -1008,137 +1170,179 @@ def determine_original_and_copies(files, duplicate_patterns=None):
     
     return original, copies
 
-def export_duplicates_list(db_path, output_file, path_pattern=None, short_format=False, duplicate_patterns=None, current_time=None):
-    """Exports duplicate list to text file"""
-    conn = sqlite3.connect(db_path)
+def format_duplicate_entry(label, file_data, path_pattern=None):
+    """Formats the classification line and path of one duplicate file as a single string"""
+    file_path, file_name, file_size, duration, bit_rate, resolution, codec_name = file_data
+    marker = " ← MATCHES PATTERN" if path_pattern is None or path_pattern in file_path else ""
+    return (f"# {label}: {format_file_size(file_size)} | {format_duration(duration)} | {format_bitrate(bit_rate)} | "
+            f"{resolution} | {codec_name[:8] if codec_name else 'N/A'}{marker}\n# {file_path}\n")
+
+def export_duplicates_list(db_path, output_file, path_pattern=None, short_format=False, duplicate_patterns=None, current_time=None,
+                           refresh_dupes=False, max_groups=None):
+    """
+    Exports duplicate list to text file
+    
+    Duplicate groups come from duplicate_hashes table, rebuilt only when
+    media_files changed or refresh_dupes is set. With max_groups only that
+    many largest groups (matching path_pattern) are fetched.
+    """
+    conn = _get_conn(db_path)
     cursor = conn.cursor()
     
-    # Search by hash (exact duplicates)
-    query = '''
-        SELECT file_hash, COUNT(*) as cnt
-        FROM media_files 
-        WHERE file_hash IS NOT NULL AND file_hash != '' AND is_corrupted = 0
-        GROUP BY file_hash
-        HAVING COUNT(*) >= 2
-        ORDER BY cnt DESC
+    # Duplicate groups by hash (exact duplicates), numbered in output order
+    if ensure_duplicate_hashes(conn, refresh_dupes):
+        groups_source = "duplicate_hashes"
+    else:
+        # Read-only database without up to date duplicate_hashes, group on the fly
+        groups_source = f"({DUPLICATE_GROUPS_SQL})"
+    groups_query = f'''
+        SELECT file_hash, cnt, group_size,
+               ROW_NUMBER() OVER (ORDER BY cnt DESC, file_hash DESC) as group_no
+        FROM {groups_source}
     '''
-    cursor.execute(query)
-    groups = cursor.fetchall()
-    method = "hash"
-    
-    if not groups:
-        print(f"{Fore.YELLOW}Duplicates by {method} not found{Style.RESET_ALL}")
-        conn.close()
-        return
-    
-    if current_time is None:
-        current_time = datetime.datetime.now()
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        # Header
-        if not short_format:
-            f.write(f"# Duplicate list by {method}\n")
-            f.write(f"# Found {len(groups)} duplicate groups\n")
-            if path_pattern:
-                f.write(f"# Filtered by pattern: {path_pattern}\n")
-            f.write(f"# Created: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("#\n")
-            f.write("#" + "="*100 + "\n\n")
-        
-        total_files = 0
-        total_wasted_space = 0
-        
-        for i, (key_value, count) in enumerate(groups, 1):
-            # Get files in group
-            detail_query = '''
-                SELECT file_path, file_name, file_size, duration, bit_rate,
-                       width || 'x' || height as resolution, codec_name
-                FROM media_files 
-                WHERE file_hash = ? AND is_corrupted = 0
-                ORDER BY file_size DESC
-            '''
-            
-            cursor.execute(detail_query, (key_value,))
-            files = cursor.fetchall()
-            
-            if not files:
-                continue
-                
-            group_size = files[0][2] if files else 0
-            wasted = group_size * (count - 1)
-            total_wasted_space += wasted
-            
-            # Determine original and copies using new algorithm
-            original_file, copy_files = determine_original_and_copies(files, duplicate_patterns)
+    with read_transaction(conn):
+        # Wasted space covers all groups, also those filtered out by path_pattern
+        cursor.execute(f"SELECT COUNT(*), SUM(group_size * (cnt - 1)) FROM {groups_source}")
+        group_count, total_wasted_space = cursor.fetchone()
+        method = "hash"
+        
+        if not group_count:
+            print(f"{Fore.YELLOW}Duplicates by {method} not found{Style.RESET_ALL}")
+            return
+        
+        # Only groups with a file matching path_pattern are fetched
+        params = {}
+        pattern_filter = ''
+        if path_pattern:
+            pattern_filter = '''
+            WHERE EXISTS (
+                SELECT 1 FROM media_files x
+                WHERE x.file_hash = g.file_hash AND x.is_corrupted = 0
+                  AND instr(x.file_path, :pattern) > 0
+            )'''
+            params['pattern'] = path_pattern
+        
+        # Groups are numbered largest first, so the limit stops the walk over idx_duplicate_hashes_order early
+        group_limit = ''
+        if max_groups:
+            group_limit = '''
+            ORDER BY group_no LIMIT :max_groups'''
+            params['max_groups'] = max_groups
+        
+        # Short format writes paths only, and original is determined by path, so
+        # metadata columns are fetched for full format only. Rows are not filtered
+        # by path_pattern in SQL: the original may be any file of the group.
+        if short_format:
+            file_columns = "m.file_path"
+        else:
+            file_columns = "m.file_path, m.file_name, m.file_size, m.duration, m.bit_rate, m.width || 'x' || m.height as resolution, m.codec_name"
+        
+        # Files of all groups with one query, largest groups first; per-group
+        # wasted and total size are computed by SQLite along with the rows.
+        # CROSS JOIN keeps groups as the outer loop, so files are looked up by
+        # hash index per group instead of scanning all of media_files.
+        cursor.execute(f'''
+            SELECT g.group_no, m.file_hash, g.cnt, g.group_size * (g.cnt - 1) as wasted, g.group_size * g.cnt as group_total,
+                   {file_columns}
+            FROM (SELECT * FROM ({groups_query}) g{pattern_filter}{group_limit}) g
+            CROSS JOIN media_files m ON m.file_hash = g.file_hash AND m.is_corrupted = 0
+            ORDER BY g.group_no, m.file_size DESC, m.id
+        ''', params)
+        
+        def fetch_rows():
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    return
+                yield from rows
+        
+        # Built once, every file of every group is checked against the patterns
+        matches_pattern = build_pattern_matcher(duplicate_patterns)
+        
+        if current_time is None:
+            current_time = datetime.datetime.now()
+        
+        with open(output_file, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as f:
+            # Header
+            if not short_format:
+                f.write(f"# Duplicate list by {method}\n")
+                f.write(f"# Found {group_count} duplicate groups\n")
+                if path_pattern:
+                    f.write(f"# Filtered by pattern: {path_pattern}\n")
+                if max_groups:
+                    f.write(f"# Limited to {max_groups} largest groups\n")
+                f.write(f"# Created: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write("#\n")
+                f.write(SEPARATOR_LINE + "\n")
             
-            # Filter by pattern if specified (apply to copies only, keep original for context)
-            filtered_copies = []
-            for file_data in copy_files:
-                file_path = file_data[0]
-                if path_pattern is None or path_pattern in file_path:
-                    filtered_copies.append(file_data)
+            total_files = 0
             
-            # Skip group if no copies match the pattern
-            if not filtered_copies:
-                continue
+            # Groups are joined into chunks, one write per EXPORT_CHUNK_ROWS groups
+            chunk = []
+            write = chunk.append
             
-            if short_format:
-                # Export only copy file paths (not original)
-                for file_path, file_name, file_size, duration, bit_rate, resolution, codec_name in filtered_copies:
-                    f.write(f"{file_path}\n")
-                    total_files += 1
-            else:
-                # Export full information with original/copy classification
-                f.write(f"# Group {i}: {len(files)} files total, {len(filtered_copies)} copies to process, hash: {key_value[:16]}...\n")
-                f.write(f"# Total size: {format_file_size(group_size * len(files))}, wasted: {format_file_size(wasted)}\n")
-                f.write("#\n")
+            for (i, key_value, count, wasted, group_total), rows in itertools.groupby(fetch_rows(), key=itemgetter(0, 1, 2, 3, 4)):
+                # Files in group
+                files = [row[5:] for row in rows]
                 
-                # Show all files in group with classification
-                f.write("# File classification:\n")
+                # Determine original and copies using new algorithm
+                original_file, copy_files = determine_original_and_copies(files, matches_pattern=matches_pattern)
                 
-                # Show original first
-                if original_file:
-                    file_path, file_name, file_size, duration, bit_rate, resolution, codec_name = original_file
-                    size_str = format_file_size(file_size)
-                    duration_str = format_duration(duration)
-                    bitrate_str = format_bitrate(bit_rate)
-                    codec_str = codec_name[:8] if codec_name else "N/A"
-                    
-                    is_matching = path_pattern is None or path_pattern in file_path
-                    marker = " ← MATCHES PATTERN" if is_matching else ""
-                    f.write(f"# ORIGINAL: {size_str} | {duration_str} | {bitrate_str} | {resolution} | {codec_str}{marker}\n")
-                    f.write(f"# {file_path}\n")
+                # Filter by pattern if specified (apply to copies only, keep original for context)
+                filtered_copies = []
+                for file_data in copy_files:
+                    file_path = file_data[0]
+                    if path_pattern is None or path_pattern in file_path:
+                        filtered_copies.append(file_data)
                 
-                # Show copies
-                for j, file_data in enumerate(copy_files, 1):
-                    file_path, file_name, file_size, duration, bit_rate, resolution, codec_name = file_data
-                    size_str = format_file_size(file_size)
-                    duration_str = format_duration(duration)
-                    bitrate_str = format_bitrate(bit_rate)
-                    codec_str = codec_name[:8] if codec_name else "N/A"
-                    
-                    is_matching = path_pattern is None or path_pattern in file_path
-                    marker = " ← MATCHES PATTERN" if is_matching else ""
-                    f.write(f"# COPY {j}: {size_str} | {duration_str} | {bitrate_str} | {resolution} | {codec_str}{marker}\n")
-                    f.write(f"# {file_path}\n")
-                
-                f.write("#\n# Files to delete (copies matching pattern):\n")
+                # Skip group if no copies match the pattern
+                if not filtered_copies:
+                    continue
                 
-                # Export only filtered copies for deletion
-                for file_path, file_name, file_size, duration, bit_rate, resolution, codec_name in filtered_copies:
-                    f.write(f"{file_path}\n")
-                    total_files += 1
+                if i % EXPORT_CHUNK_ROWS == 0:
+                    f.write(''.join(chunk))
+                    chunk.clear()
                 
-                f.write("#\n")
-            
-    conn.close()
+                if short_format:
+                    # Export only copy file paths (not original)
+                    for file_data in filtered_copies:
+                        write(f"{file_data[0]}\n")
+                    total_files += len(filtered_copies)
+                else:
+                    # Export full information with original/copy classification
+                    write(f"# Group {i}: {len(files)} files total, {len(filtered_copies)} copies to process, hash: {key_value[:16]}...\n")
+                    write(f"# Total size: {format_file_size(group_total)}, wasted: {format_file_size(wasted)}\n")
+                    write("#\n")
+                    
+                    # Show all files in group with classification
+                    write("# File classification:\n")
+                    
+                    # Show original first
+                    if original_file:
+                        write(format_duplicate_entry("ORIGINAL", original_file, path_pattern))
+                    
+                    # Show copies
+                    for j, file_data in enumerate(copy_files, 1):
+                        write(format_duplicate_entry(f"COPY {j}", file_data, path_pattern))
+                    
+                    write("#\n# Files to delete (copies matching pattern):\n")
+                    
+                    # Export only filtered copies for deletion
+                    for file_data in filtered_copies:
+                        write(f"{file_data[0]}\n")
+                    total_files += len(filtered_copies)
+                    
+                    write("#\n")
+            f.write(''.join(chunk))
     
     print(f"\n{Fore.GREEN}✅ Duplicate list exported to: {output_file}{Style.RESET_ALL}")
-    print(f"Duplicate groups found: {len(groups)}")
+    print(f"Duplicate groups found: {group_count}")
     if duplicate_patterns:
         print(f"Duplicate patterns used: {', '.join(duplicate_patterns)}")
     if path_pattern:
         print(f"Filtered by pattern: '{path_pattern}'")
+    if max_groups:
+        print(f"Limited to {max_groups} largest groups")
     print(f"Copy files to process: {total_files}")
     print(f"Format: {'Short (paths only)' if short_format else 'Full (with metadata)'}")
     print(f"Space that can be freed: {Fore.RED}{format_file_size(total_wasted_space)}{Style.RESET_ALL}")
@@ -1149,7 +1353,7 @@ def export_directory_structure(db_path, output_file, console_output=False, curre
     Shows nested directory structure with file counts and sizes
     """
     
-    results = query_all_database(db_path, ['file_path', 'file_size', 'media_type'], include_corrupted=False)
+    results = query_all_database(_get_conn(db_path), ['file_path', 'file_size', 'media_type'], include_corrupted=False)
     
     if not results:
         print(f"{Fore.YELLOW}No files found in database{Style.RESET_ALL}")
@@ -1169,12 +1373,14 @@ def export_directory_structure(db_path, output_file, console_output=False, curre
         }
     })
 
-    common_root_dir = os.path.commonpath([os.path.dirname(row[0]) for row in results])
+    # Directory of every file, computed once
+    dir_paths = [os.path.dirname(row[0]) for row in results]
+    common_root_dir = os.path.commonpath(dir_paths)
     
     # Process each file
-    for file_path, file_size, media_type in results:
-        # Get directory path
-        dir_path = os.path.dirname(file_path)
+    for dir_path, (file_path, file_size, media_type) in zip(dir_paths, results):
+        # Parents of a directory seen before are already linked
+        is_new_dir = dir_path not in dir_tree
         
         # Add file to its directory
         dir_tree[dir_path]['files'].append((file_path, file_size, media_type))
@@ -1192,7 +1398,7 @@ def export_directory_structure(db_path, output_file, console_output=False, curre
             stats['other_files'] += 1
         
         # Build parent-child relationships
-        current_path = dir_path
+        current_path = dir_path if is_new_dir else None
         while current_path and current_path != common_root_dir:
             parent_path = os.path.dirname(current_path)
             if parent_path == current_path:  # Root reached (/)
@@ -1221,6 +1427,10 @@ def export_directory_structure(db_path, output_file, console_output=False, curre
     # Get all directories sorted by path depth and name
     all_dirs = sorted(dir_tree.keys(), key=lambda x: (x.count(os.sep), x))
     
+    # Colors for directory lines, bound once instead of colorama lookups per directory
+    cyan, magenta, yellow, red, green, blue = Fore.CYAN, Fore.MAGENTA, Fore.YELLOW, Fore.RED, Fore.GREEN, Fore.BLUE
+    grey, reset = Fore.LIGHTBLACK_EX, Style.RESET_ALL
+    
     # Function to display directory tree (unified for console and file output)
     def display_directory_tree(dir_path, output_file, depth=0):
         """
@@ -1259,30 +1469,30 @@ def export_directory_structure(db_path, output_file, console_output=False, curre
         if recursive_stats['images'] > 0:
             count = recursive_stats['images']
             label = f"{count} image{'s' if count != 1 else ''}"
-            type_parts.append(f"{Fore.CYAN}{label}{Style.RESET_ALL}")
+            type_parts.append(f"{cyan}{label}{reset}")
                 
         if recursive_stats['videos'] > 0:
             count = recursive_stats['videos']
             label = f"{count} video{'s' if count != 1 else ''}"
-            type_parts.append(f"{Fore.MAGENTA}{label}{Style.RESET_ALL}")
+            type_parts.append(f"{magenta}{label}{reset}")
                 
         if recursive_stats['other_files'] > 0:
             count = recursive_stats['other_files']
             label = f"{count} file{'s' if count != 1 else ''}"
-            type_parts.append(f"{Fore.YELLOW}{label}{Style.RESET_ALL}")
+            type_parts.append(f"{yellow}{label}{reset}")
         
         # Format size with colors
         size_str = format_file_size(total_size)
         if total_size > 1_000_000_000:  # > 1GB
-            colored_size = f"{Fore.RED}{size_str}{Style.RESET_ALL}"
+            colored_size = f"{red}{size_str}{reset}"
         elif total_size > 100_000_000:  # > 100MB
-            colored_size = f"{Fore.YELLOW}{size_str}{Style.RESET_ALL}"
+            colored_size = f"{yellow}{size_str}{reset}"
         else:
-            colored_size = f"{Fore.GREEN}{size_str}{Style.RESET_ALL}"
+            colored_size = f"{green}{size_str}{reset}"
         
         # Build description
         if total_files == 0:
-            desc = f"{Fore.LIGHTBLACK_EX}[empty]{Style.RESET_ALL}"
+            desc = f"{grey}[empty]{reset}"
         else:
             parts = []
             if subdirs_count > 0:
@@ -1294,7 +1504,7 @@ def export_directory_structure(db_path, output_file, console_output=False, curre
         
         # Format directory path with colors
         display_path = dir_path + "/"
-        colored_path = f"{Fore.BLUE}{display_path}{Style.RESET_ALL}"
+        colored_path = f"{blue}{display_path}{reset}"
 
         output_file.write(f"{colored_path} {desc}\n")
 
@@ -1308,20 +1518,20 @@ def export_directory_structure(db_path, output_file, console_output=False, curre
         if current_time is None:
             current_time = datetime.datetime.now()
             
-        with open(output_file, 'w', encoding='utf-8') as f:
+        with open(output_file, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE) as f:
             f.write(f"# Directory Structure Analysis\n")
             f.write(f"# Created: {current_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write(f"# Total directories analyzed: {len(all_dirs)}\n")
             f.write("#\n")
             f.write("# Format: [subdirs count, files breakdown, total size]\n")
             f.write("# Legend: dir/ = directory, empty = no files, images/videos/files = media types\n")
-            f.write("#" + "="*100 + "\n\n")
+            f.write(SEPARATOR_LINE + "\n")
             
             exported_count = 0
             total_size_all = 0
             
             # Connect to database for root directory check
-            conn = sqlite3.connect(db_path)
+            conn = _get_conn(db_path)
             cursor = conn.cursor()
             
             # Start from root directories (those without parents in our tree)
@@ -1349,13 +1559,11 @@ def export_directory_structure(db_path, output_file, console_output=False, curre
             for root_dir in sorted(root_dirs):
                 display_directory_tree(root_dir, StripAnsiWriter(f))
 
-            f.write("\n" + "#" + "="*100 + "\n")
+            f.write("\n" + SEPARATOR_LINE)
             f.write(f"# SUMMARY:\n")
             f.write(f"# Directories exported: {exported_count}\n")
             f.write(f"# Total size: {format_file_size(total_size_all)}\n")
         
-            conn.close()
-        
         if output_file:
             print(f"\n{Fore.GREEN}✅ Directory structure exported to: {output_file}{Style.RESET_ALL}")
 
@@ -1461,6 +1669,17 @@ def main():
         action='store_true',
         help='Export duplicate files'
     )
+    parser.add_argument(
+        '--refresh-dupes',
+        action='store_true',
+        help='Rebuild cached duplicate groups before --export-duplicates (done automatically when files were added)'
+    )
+    parser.add_argument(
+        '--max-groups',
+        type=int,
+        metavar='N',
+        help='Export only N largest duplicate groups with --export-duplicates'
+    )
     parser.add_argument(
         '--export-dirs',
         action='store_true',
@@ -1507,11 +1726,10 @@ def main():
     
     # Check database existence
     try:
-        conn = sqlite3.connect(args.database)
+        conn = _get_conn(args.database)
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM media_files")
         total_files = cursor.fetchone()[0]
-        conn.close()
         
         if total_files == 0:
             print(f"{Fore.YELLOW}Database is empty. First run video file analysis.{Style.RESET_ALL}")
@@ -1526,9 +1744,11 @@ def main():
     # Check if export is requested
     if not args.export_list and not (args.export_dirs and args.console):
         # No export requested - show default reports
-        query_largest_files(args.database, 20)
-        query_high_bitrate_files(args.database, args.min_bitrate or 10, 20)
-        query_longest_files(args.database, 20)
+        show_reports(args.database, [
+            largest_files_report(20),
+            high_bitrate_files_report(args.min_bitrate or 10, 20),
+            longest_files_report(20),
+        ])
         return
     
     # Export operations require --export-list to be specified
@@ -1576,7 +1796,8 @@ def main():
         # Use first pattern for filtering, all patterns for duplicate detection
         filter_pattern = args.export_pattern[0] if args.export_pattern else None
         duplicate_patterns = args.export_pattern if args.export_pattern else None
-        export_duplicates_list(args.database, args.export_list, filter_pattern, args.short, duplicate_patterns, current_time)
+        export_duplicates_list(args.database, args.export_list, filter_pattern, args.short, duplicate_patterns, current_time,
+                               args.refresh_dupes, args.max_groups)
     elif args.export_dirs:
         output_file = args.export_list if args.export_list else None
         export_directory_structure(args.database, output_file, args.console, current_time)
@@ -8,30 +8,56 @@ Usage:
 """
 
 import os
+import stat
 import sys
-import subprocess
+import contextlib
+import itertools
+import mmap
+import re
 import unicodedata
 import argparse
 import logging
+import queue
+import signal
+import multiprocessing
 import sqlite3
-from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from colorama import Fore, Style, init
 
 # Import local modules
-from lib.video_converter import encode_video_file
-from lib.utils import (
-    setup_logging, read_file_list, format_file_size, get_output_path,
-    log_conversion_operation, load_database_file_paths, 
-    DatabaseProtectionError
+from lib.video_converter import (
+    encode_video_files, check_ffmpeg, detect_encoder, stop_encoding,
+    read_encoded_outputs, find_encoded_copy, link_encoded_copy, ENCODERS
 )
+from lib.utils import load_database_file_paths, DatabaseProtectionError, format_file_size
 
 # Initialize colorama with forced colors for container support
 init(autoreset=True, strip=False)
 
+# Console output of finished files is flushed once per this many files
+PRINT_FLUSH_INTERVAL = 16
+
+def _worker_context():
+    """
+    Returns multiprocessing context for encode workers
+    
+    Workers are started from a forkserver so they are not forked while the
+    log listener thread of this process holds its locks.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context('forkserver')
+
 def setup_logging(log_file="video_encoder.log", log_level=logging.INFO):
-    """Sets up logging to file and console"""
+    """
+    Sets up logging to file and console
+    
+    Records are written by a background QueueListener thread, so the encode loop
+    only puts them to a queue. Returns (logger, listener), listener must be
+    stopped before exit to flush remaining records.
+    """
     # Create formatter
     formatter = logging.Formatter(
         '%(asctime)s - %(levelname)s - %(message)s',
@@ -49,15 +75,19 @@ def setup_logging(log_file="video_encoder.log", log_level=logging.INFO):
     file_handler = logging.FileHandler(log_file, encoding='utf-8')
     file_handler.setLevel(log_level)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
     
     # Console handler (WARNING and above only)
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.WARNING)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
     
-    return logger
+    # Logger only enqueues records, handlers run in the listener thread
+    log_queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    
+    return logger, listener
 
 def log_conversion_operation(logger, input_path, output_path, success, original_size=0, 
                          output_size=0, duration_seconds=0, error_msg=None):
@@ -72,69 +102,116 @@ def log_conversion_operation(logger, input_path, output_path, success, original_
     else:
         logger.error(f"ENCODE_FAILED: {input_path} -> {output_path} | Error: {error_msg} | Method: ffmpeg")
 
-def read_file_list(file_path):
-    """Reads list of files from text file"""
-    files = []
+def read_file_list(file_path, pattern=None, regex=False):
+    """
+    Reads list of files from text file
+    
+    Generator: paths are yielded one by one while the file is read, only
+    paths containing pattern (if given) are yielded. With regex=True pattern is
+    a regular expression searched in the path. Regular files are memory-mapped,
+    pipes and FIFOs (e.g. <(media_query.py ...)) are read line by line. Lines are
+    decoded only after comment and pattern checks.
+    """
+    # Pattern is compared with NFC-normalized paths
+    pattern = unicodedata.normalize("NFC", pattern) if pattern else None
+    matcher = None
+    if pattern and regex:
+        matcher = re.compile(pattern).search
+        pattern = None
+    pattern_bytes = pattern.encode('utf-8') if pattern else None
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                line = unicodedata.normalize("NFC", line)
-                # Skip comments and empty lines
-                if line and not line.startswith('#'):
-                    files.append(line)
-        return files
+        with open(file_path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if stat.S_ISREG(st.st_mode):
+                # Empty file can't be mapped
+                if st.st_size == 0:
+                    return
+                source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                source = contextlib.nullcontext(f)
+            with source as src:
+                for raw in iter(src.readline, b''):
+                    raw = raw.strip()
+                    # Skip comments and empty lines
+                    if not raw or raw.startswith(b'#'):
+                        continue
+                    # NFC normalization doesn't change ASCII lines, so most lines
+                    # are filtered as bytes and decoded without normalizing
+                    if raw.isascii():
+                        if pattern_bytes and pattern_bytes not in raw:
+                            continue
+                        line = raw.decode('ascii')
+                    else:
+                        line = unicodedata.normalize("NFC", raw.decode('utf-8')).strip()
+                        if pattern and pattern not in line:
+                            continue
+                    if matcher and not matcher(line):
+                        continue
+                    yield line
     except FileNotFoundError:
         print(f"{Fore.RED}❌ File not found: {file_path}{Style.RESET_ALL}")
-        return []
     except Exception as e:
         print(f"{Fore.RED}❌ Error reading file: {e}{Style.RESET_ALL}")
-        return []
-
-def format_file_size(size_bytes):
-    """Formats file size in human readable format"""
-    if size_bytes is None:
-        return "N/A"
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024:
-            return f"{size_bytes:.1f} {unit}"
-        size_bytes /= 1024
-    return f"{size_bytes:.1f} TB"
 
 def format_duration(seconds):
     """Formats duration in HH:MM:SS format"""
     if seconds is None:
         return "N/A"
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, secs = divmod(rest, 60)
     if hours > 0:
         return f"{hours:02d}:{minutes:02d}:{secs:02d}"
     else:
         return f"{minutes:02d}:{secs:02d}"
 
-def encode_video(input_path, output_path, logger, dry_run=True):
-    """Encodes single video file - wrapper around lib.video_converter.encode_video_file"""
+def _worker_interrupt(signum, frame):
+    """Ctrl+C in worker process: kill running ffmpeg, remaining files of the batch fail fast"""
+    stop_encoding()
+
+def _worker_init(cpu_sets=None, worker_counter=None):
+    """
+    Initializes encode worker process, KeyboardInterrupt is handled by the main process
+    
+    With cpu_sets every worker takes the next set (numbered by worker_counter)
+    and pins itself to it; ffmpeg processes inherit the affinity.
+    """
+    signal.signal(signal.SIGINT, _worker_interrupt)
+    if cpu_sets:
+        with worker_counter.get_lock():
+            worker_id = worker_counter.value
+            worker_counter.value += 1
+        os.sched_setaffinity(0, cpu_sets[worker_id % len(cpu_sets)])
+
+def get_cpu_sets(jobs):
+    """Splits CPUs available to this process into jobs disjoint sets"""
+    cpus = sorted(os.sched_getaffinity(0))
+    share = max(1, len(cpus) // jobs)
+    return [cpus[i * share:(i + 1) * share] or cpus for i in range(jobs)]
+
+def encode_videos(tasks, dry_run=True, threads=None, encoder='x264'):
+    """
+    Encodes batch of video files - wrapper around lib.video_converter.encode_video_files
     
-    # Handle dry-run with UI output
+    tasks is a list of (input_path, output_path, original_size, source_hash), a
+    batch of one file is encoded on its own. Runs in a worker process, results are logged and
+    printed by the main process (see log_encode_result and print_encode_result).
+    """
+    pairs = [(input_path, output_path) for input_path, output_path, _, _ in tasks]
+    original_sizes = [original_size for _, _, original_size, _ in tasks]
+    source_hashes = [source_hash for _, _, _, source_hash in tasks]
+    return encode_video_files(pairs, dry_run=dry_run, threads=threads, original_sizes=original_sizes, encoder=encoder,
+                              source_hashes=source_hashes)
+
+def log_encode_result(logger, result, dry_run):
+    """Logs result of single file encoding"""
+    input_path, output_path = result['input_path'], result['output_path']
     if dry_run:
-        print(f"  {Fore.CYAN}[DRY-RUN]{Style.RESET_ALL} Encode: {input_path} -> {os.path.basename(output_path)}")
-        result = encode_video_file(input_path, output_path, dry_run=True)
         # Log dry-run operation
         log_conversion_operation(
             logger, input_path, output_path, True,
             result['original_size'], result['output_size'], 0
         )
-        return result
-    
-    # Actual encoding
-    result = encode_video_file(input_path, output_path, dry_run=False)
-    
-    # Add UI feedback and logging for real encoding
-    if result['success']:
-        temp_size_str = format_file_size(result['output_size'])
-        print(f"  {Fore.GREEN}🔄{Style.RESET_ALL} Encoding completed: {temp_size_str}")
-        
+    elif result['success']:
         # Log successful encoding
         log_conversion_operation(logger, input_path, output_path, True, 
                              result['original_size'], result['output_size'], result['duration'])
@@ -142,11 +219,59 @@ def encode_video(input_path, output_path, logger, dry_run=True):
         # Log failed encoding
         log_conversion_operation(logger, input_path, output_path, False, 
                              result['original_size'], 0, result['duration'], result['error'])
+
+def print_encode_result(index, total, input_path, output_path, result, dry_run):
+    """Prints result of single file encoding (whole block with one write)"""
+    lines = [f"\n[{index}/{total}] {Fore.CYAN}{input_path}{Style.RESET_ALL}"]
+    
+    if dry_run:
+        lines.append(f"  {Fore.CYAN}[DRY-RUN]{Style.RESET_ALL} Encode: {input_path} -> {os.path.basename(output_path)}")
+    elif result['success']:
+        lines.append(f"  {Fore.GREEN}🔄{Style.RESET_ALL} Encoding completed: {format_file_size(result['output_size'])}")
     
-    return result
+    if result['success']:
+        original_size_str = format_file_size(result['original_size'])
+        output_size_str = format_file_size(result['output_size'])
+        compression = ((result['original_size'] - result['output_size']) / result['original_size'] * 100) if result['original_size'] > 0 else 0
+        
+        lines.append(f"  {Fore.GREEN}✅ Success{Style.RESET_ALL}: {original_size_str} → {output_size_str} (-{compression:.1f}%)")
+        
+        if not dry_run and result['duration'] > 0:
+            speed = f" ({result['media_duration'] / result['duration']:.1f}x realtime)" if result.get('media_duration') else ""
+            lines.append(f"  ⏱️  Duration: {format_duration(result['duration'])}{speed}")
+    else:
+        lines.append(f"  {Fore.RED}❌ Error: {result['error']}{Style.RESET_ALL}")
+    
+    print("\n".join(lines))
+
+def path_exists(path, dir_entries):
+    """
+    Checks if path (pathlib.Path) exists using one os.scandir per directory instead of a stat per file
+    
+    dir_entries caches {name: is_symlink} for every scanned directory (None if
+    the directory can't be listed, then Path.exists is used).
+    """
+    directory, name = path.parent, path.name
+    if not name:
+        return path.exists()
+    if directory not in dir_entries:
+        try:
+            with os.scandir(directory) as entries:
+                dir_entries[directory] = {entry.name: entry.is_symlink() for entry in entries}
+        except OSError:
+            dir_entries[directory] = None
+    
+    entries = dir_entries[directory]
+    if entries is None:
+        return path.exists()
+    if name not in entries:
+        return False
+    # Symlinks need a real check, they can be broken
+    return path.exists() if entries[name] else True
 
 def process_file_list(file_list, logger, suffix="_encoded", 
-                     dry_run=True, skip_existing=True, database_path=None):
+                     dry_run=True, skip_existing=True, database_path=None, jobs=None, batch_size=1, encoder='x264',
+                     pin_cpus=False):
     """Processes list of files"""
     
     # Load database file paths once for fast lookup
@@ -166,6 +291,7 @@ def process_file_list(file_list, logger, suffix="_encoded",
         print(f"{Fore.GREEN}🎬 ENCODING MODE{Style.RESET_ALL}")
     
     print(f"Suffix for encoded files: {suffix}")
+    print(f"Encoder: {encoder}")
     print(f"Skip existing files: {skip_existing}")
     if database_path:
         print(f"{Fore.RED}🛡️  Database protection: {database_path} (STRICT MODE){Style.RESET_ALL}")
@@ -174,14 +300,28 @@ def process_file_list(file_list, logger, suffix="_encoded",
     tasks = []
     skipped_count = 0
     skipped_db_count = 0
+    linked_count = 0
+    queued_size = 0
     
-    # Prepare tasks
+    # Prepare tasks, input is stat'ed once here and its size passed to the encoder
+    dir_entries = {}
+    encoded_outputs = {}
     for file_path in file_list:
-        if not os.path.exists(file_path):
+        input_path = Path(file_path)
+        try:
+            file_size = input_path.stat().st_size
+        except OSError:
             print(f"{Fore.YELLOW}⚠️  Skipped (not found): {file_path}{Style.RESET_ALL}")
             continue
         
-        output_path = get_output_path(file_path, suffix, preserve_extension=True)
+        if file_size == 0:
+            print(f"{Fore.YELLOW}⚠️  Skipped (empty file): {file_path}{Style.RESET_ALL}")
+            skipped_count += 1
+            continue
+        
+        # Same name with suffix, original extension is kept
+        output = input_path.with_name(f"{input_path.stem}{suffix}{input_path.suffix}")
+        output_path = str(output)
         
         # Check if output file exists in database first
         if db_file_paths and output_path in db_file_paths:
@@ -190,21 +330,49 @@ def process_file_list(file_list, logger, suffix="_encoded",
             raise DatabaseProtectionError(message)
         
         # Check if we need to skip based on filesystem
-        if skip_existing and os.path.exists(output_path):
-            print(f"{Fore.BLUE}⏭️  Skipped (already exists): {os.path.basename(output_path)}{Style.RESET_ALL}")
+        if skip_existing and path_exists(output, dir_entries):
+            print(f"{Fore.BLUE}⏭️  Skipped (already exists): {output.name}{Style.RESET_ALL}")
             skipped_count += 1
             continue
         
-        tasks.append((file_path, output_path))
+        # Output of a run with another suffix and the same encoder settings is reused instead of encoding again,
+        # xattrs of a directory are read once for all of its files
+        existing_path = source_hash = None
+        names = dir_entries.get(output.parent) if skip_existing else None
+        if names:
+            if output.parent not in encoded_outputs:
+                encoded_outputs[output.parent] = read_encoded_outputs(output.parent, names)
+            existing_path, source_hash = find_encoded_copy(file_path, encoded_outputs[output.parent], encoder,
+                                                           verify=not dry_run)
+        if existing_path:
+            if dry_run:
+                print(f"{Fore.CYAN}[DRY-RUN]{Style.RESET_ALL} Link: {os.path.basename(existing_path)} -> {output.name}")
+            else:
+                try:
+                    link_encoded_copy(existing_path, output_path)
+                    print(f"{Fore.GREEN}🔗 Linked existing encode: {os.path.basename(existing_path)} -> {output.name}{Style.RESET_ALL}")
+                except OSError as e:
+                    print(f"{Fore.YELLOW}⚠️  Failed to link {existing_path}: {e}{Style.RESET_ALL}")
+                    existing_path = None
+            if existing_path:
+                linked_count += 1
+                continue
+        
+        tasks.append((file_path, output_path, file_size, source_hash))
+        queued_size += file_size
     
     if not tasks:
+        if linked_count > 0:
+            print(f"\nLinked existing encodes: {linked_count}")
         print(f"{Fore.YELLOW}❌ No files to process{Style.RESET_ALL}")
         return
     
     skip_message = f"skipped: {skipped_count}"
     if skipped_db_count > 0:
         skip_message += f", protected: {skipped_db_count}"
-    print(f"\nProcessing {len(tasks)} files ({skip_message}):")
+    if linked_count > 0:
+        skip_message += f", linked: {linked_count}"
+    print(f"\nProcessing {len(tasks)} files, {format_file_size(queued_size)} ({skip_message}):")
     
     # Statistics
     total_original_size = 0
@@ -212,28 +380,57 @@ def process_file_list(file_list, logger, suffix="_encoded",
     success_count = 0
     error_count = 0
     
-    # Process files
-    for i, (input_path, output_path) in enumerate(tasks, 1):
-        print(f"\n[{i}/{len(tasks)}] {Fore.CYAN}{input_path}{Style.RESET_ALL}")
-        
-        result = encode_video(input_path, output_path, logger, dry_run)
-        
-        if result['success']:
-            original_size_str = format_file_size(result['original_size'])
-            output_size_str = format_file_size(result['output_size'])
-            compression = ((result['original_size'] - result['output_size']) / result['original_size'] * 100) if result['original_size'] > 0 else 0
-            
-            print(f"  {Fore.GREEN}✅ Success{Style.RESET_ALL}: {original_size_str} → {output_size_str} (-{compression:.1f}%)")
-            
-            if not dry_run and result['duration'] > 0:
-                print(f"  ⏱️  Duration: {format_duration(result['duration'])}")
-            
-            success_count += 1
-            total_original_size += result['original_size']
-            total_output_size += result['output_size']
+    # Largest files first, so parallel jobs don't end with one long encode while others idle
+    tasks.sort(key=lambda task: task[2], reverse=True)
+    
+    # Several files can be encoded by one ffmpeg process
+    batch_size = max(1, batch_size)
+    batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+    if batch_size > 1:
+        print(f"Files per ffmpeg process: up to {batch_size}")
+    
+    # Run several ffmpeg processes at once, each one limited to its share of CPU cores
+    cpu_count = os.cpu_count() or 1
+    jobs = max(1, min(jobs or max(1, cpu_count // 4), len(batches)))
+    threads = max(1, cpu_count // jobs) if jobs > 1 else None
+    if jobs > 1:
+        print(f"Parallel jobs: {jobs} ({threads} threads per ffmpeg)")
+    
+    # Optionally give every job its own CPUs, ffmpeg processes don't migrate between them
+    context = _worker_context()
+    initargs = ()
+    if pin_cpus and jobs > 1:
+        if hasattr(os, 'sched_setaffinity'):
+            cpu_sets = get_cpu_sets(jobs)
+            initargs = (cpu_sets, (context or multiprocessing).Value('i', 0))
+            print(f"CPU pinning: {len(cpu_sets[0])} CPUs per job")
         else:
-            print(f"  {Fore.RED}❌ Error: {result['error']}{Style.RESET_ALL}")
-            error_count += 1
+            print(f"{Fore.YELLOW}⚠️  CPU pinning is not supported on this platform{Style.RESET_ALL}")
+    
+    # Process files in worker processes, results are logged and printed in completion order
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context, initializer=_worker_init, initargs=initargs) as executor:
+        futures = [executor.submit(encode_videos, batch, dry_run, threads, encoder) for batch in batches]
+        
+        i = 0
+        try:
+            for future in as_completed(futures):
+                for result in future.result():
+                    i += 1
+                    log_encode_result(logger, result, dry_run)
+                    print_encode_result(i, len(tasks), result['input_path'], result['output_path'], result, dry_run)
+                    if i % PRINT_FLUSH_INTERVAL == 0:
+                        sys.stdout.flush()
+                
+                    if result['success']:
+                        success_count += 1
+                        total_original_size += result['original_size']
+                        total_output_size += result['output_size']
+                    else:
+                        error_count += 1
+        except KeyboardInterrupt:
+            # Workers got Ctrl+C too and killed their ffmpeg, don't start queued batches
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
     
     # Final statistics
     print("\n" + "=" * 80)
@@ -253,7 +450,7 @@ def process_file_list(file_list, logger, suffix="_encoded",
 
 def main():
     parser = argparse.ArgumentParser(
-        description='Mass video encoding using FFmpeg via Docker',
+        description='Mass video encoding using FFmpeg',
         epilog='Creates compressed copies of files with specified suffix'
     )
     parser.add_argument(
@@ -279,40 +476,82 @@ def main():
         '--pattern',
         help='Only process files containing specified pattern in path'
     )
+    parser.add_argument(
+        '--regex',
+        action='store_true',
+        help='Treat --pattern as regular expression (e.g. \'\\.mov$\')'
+    )
     parser.add_argument(
         '--database',
         help='SQLite database path for protection checks'
     )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        help='Number of parallel ffmpeg encodes (default: CPU count / 4)'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=1,
+        help='Number of files encoded by one ffmpeg process (default: 1). A batch encodes the first '
+             'video and audio stream of each file, while a single file gets ffmpeg\'s default selection '
+             '(largest video, audio with most channels); this only differs for files with several streams'
+    )
+    parser.add_argument(
+        '--pin-cpus',
+        action='store_true',
+        help='Pin every parallel job to its own set of CPUs'
+    )
+    parser.add_argument(
+        '--encoder',
+        choices=['auto'] + list(ENCODERS),
+        default='auto',
+        help='Video encoder, auto picks a working hardware encoder or falls back to x264 (default: auto)'
+    )
     
     args = parser.parse_args()
     
+    if args.regex:
+        if not args.pattern:
+            parser.error('--regex requires --pattern')
+        try:
+            re.compile(args.pattern)
+        except re.error as e:
+            parser.error(f"invalid --pattern regular expression: {e}")
+    
     # Check file list
     if not os.path.exists(args.file_list):
         print(f"{Fore.RED}❌ File list not found: {args.file_list}{Style.RESET_ALL}")
         return 1
     
-    # Read file list
+    # Read file list lazily, pattern filter is applied while reading
     print(f"📋 Reading list from: {args.file_list}")
-    file_list = read_file_list(args.file_list)
+    if args.pattern:
+        print(f"Pattern filter: '{args.pattern}'" + (" (regex)" if args.regex else ""))
+    file_list = read_file_list(args.file_list, args.pattern, args.regex)
     
-    if not file_list:
-        print(f"{Fore.YELLOW}⚠️  File list is empty{Style.RESET_ALL}")
+    first_path = next(file_list, None)
+    if first_path is None:
+        if args.pattern:
+            print(f"{Fore.YELLOW}⚠️  List is empty after filtering{Style.RESET_ALL}")
+        else:
+            print(f"{Fore.YELLOW}⚠️  File list is empty{Style.RESET_ALL}")
         return 1
+    file_list = itertools.chain([first_path], file_list)
     
-    print(f"Found {len(file_list)} paths in list")
-    
-    # Filter by pattern if specified
-    if args.pattern:
-        original_count = len(file_list)
-        file_list = [f for f in file_list if args.pattern in f]
-        print(f"After pattern filtering '{args.pattern}': {len(file_list)} of {original_count}")
-    
-    if not file_list:
-        print(f"{Fore.YELLOW}⚠️  List is empty after filtering{Style.RESET_ALL}")
+    # ffmpeg is needed only for real encoding
+    if not args.dry_run and not check_ffmpeg():
+        print(f"{Fore.RED}❌ ffmpeg not found in PATH{Style.RESET_ALL}")
         return 1
     
+    # Hardware encoders are probed with a short test encode
+    encoder = args.encoder
+    if encoder == 'auto':
+        encoder = detect_encoder() if check_ffmpeg() else 'x264'
+    
     # Setup logging
-    logger = setup_logging()
+    logger, log_listener = setup_logging()
     
     # Start processing
     try:
@@ -322,7 +561,11 @@ def main():
             suffix=args.suffix,
             dry_run=args.dry_run,
             skip_existing=not args.no_skip_existing,
-            database_path=args.database
+            database_path=args.database,
+            jobs=args.jobs,
+            batch_size=args.batch_size,
+            encoder=encoder,
+            pin_cpus=args.pin_cpus
         )
     except DatabaseProtectionError as e:
         print(f"\n{Fore.RED}🛡️  Database protection triggered: {e}{Style.RESET_ALL}")
@@ -332,6 +575,9 @@ def main():
         print(f"\n{Fore.YELLOW}⚠️  Processing interrupted by user{Style.RESET_ALL}")
         logger.warning("Processing interrupted by user")
         return 1
+    finally:
+        # Write out queued log records
+        log_listener.stop()
     
     return 0
 